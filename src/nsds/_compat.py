@@ -4,3 +4,8 @@ PANDAS_MAJOR = int(pd.__version__.split(".")[0])
 
 # pandas 3 moved text columns from `object` to a dedicated `str` dtype
 TEXT_DTYPES: list[str] = ["object", "str"] if PANDAS_MAJOR >= 3 else ["object"]
+
+
+def copy_on_write() -> bool:
+    """ Whether a result may share memory with its input, copied only when written to """
+    return PANDAS_MAJOR >= 3 or pd.get_option("mode.copy_on_write") is True
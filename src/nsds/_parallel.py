@@ -0,0 +1,40 @@
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Literal
+
+type ExecutorKind = Literal["thread", "process"]
+
+_EXECUTORS: dict[str, type[Executor]] = {
+    "thread": ThreadPoolExecutor,
+    "process": ProcessPoolExecutor,
+}
+
+
+def ordered_map[T, R](func: Callable[[T], R],
+                      items: Iterable[T],
+                      *,
+                      max_workers: int | None = 1,
+                      executor: ExecutorKind = "thread",
+                      chunksize: int = 1) -> Iterator[R]:
+    """
+    Lazy `map` over a thread or process pool, yielding results in input order.
+
+    `max_workers=1` runs in the calling thread without starting a pool, and
+    `None` leaves the worker count to the executor. A process pool needs
+    `func` and the items to be picklable.
+    """
+    if executor not in _EXECUTORS:
+        raise ValueError(f"`executor` must be one of {sorted(_EXECUTORS)}, got '{executor}'")
+    if max_workers == 1:
+        return map(func, items)
+    return _pool_map(_EXECUTORS[executor], func, items, max_workers, chunksize)
+
+
+def _pool_map[T, R](executor_class: type[Executor],
+                    func: Callable[[T], R],
+                    items: Iterable[T],
+                    max_workers: int | None,
+                    chunksize: int) -> Iterator[R]:
+    # A generator, so that the pool only starts once the caller begins iterating
+    with executor_class(max_workers=max_workers) as pool:
+        yield from pool.map(func, items, chunksize=chunksize)
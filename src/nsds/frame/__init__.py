@@ -1,17 +1,33 @@
+from nsds.frame.cache import CsvCache
 from nsds.frame.extensions import NDFrameExtensions, extension_names, install
-from nsds.frame.io import read_csv_pyarrow, read_csvs
+from nsds.frame.io import (
+    IncrementalCsvReader,
+    infer_csv_schema,
+    iter_csvs,
+    read_csv_pyarrow,
+    read_csvs,
+    scan_csvs,
+)
 from nsds.frame.options import set_pandas_options
-from nsds.frame.tools import Percentiles, dt_group, merge_insert_at, percentiles
+from nsds.frame.sketch import QuantileSketch
+from nsds.frame.tools import Percentiles, dt_aggregate, dt_group, merge_insert_at, percentiles
 
 __all__ = [
+    "CsvCache",
+    "IncrementalCsvReader",
     "NDFrameExtensions",
     "Percentiles",
+    "QuantileSketch",
+    "dt_aggregate",
     "dt_group",
     "extension_names",
+    "infer_csv_schema",
     "install",
+    "iter_csvs",
     "merge_insert_at",
     "percentiles",
     "read_csv_pyarrow",
     "read_csvs",
+    "scan_csvs",
     "set_pandas_options",
 ]
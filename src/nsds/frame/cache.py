@@ -0,0 +1,99 @@
+import hashlib
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+_SUFFIX = ".feather"
+
+
+class CsvCache:
+    """
+    Parsed CSV files, kept as uncompressed Feather in `directory`.
+
+    An entry is keyed by the source path and the `pd.read_csv` arguments, and
+    is only used while the file keeps the size and mtime it had when parsed.
+    A hit memory-maps the Feather file instead of parsing the CSV again. The
+    arguments must have a stable `repr` (no lambdas) for entries to be found.
+
+    With `max_mb`, the least recently used entries are evicted after each write
+    until the directory fits.
+    """
+
+    def __init__(self, directory: str | Path, max_mb: float | None = None):
+        self.directory = Path(directory).expanduser()
+        self.max_mb = max_mb
+
+    def read_csv(self, filepath: str | Path, **kwargs) -> pd.DataFrame:
+        filepath = Path(filepath)
+        entry = self._entry(filepath, kwargs)
+        if entry.exists():
+            # mtime doubles as the last-used time, since atime is often not kept
+            entry.touch()
+            return feather.read_table(entry, memory_map=True).to_pandas()
+
+        df = pd.read_csv(filepath, **kwargs)
+        self._write(entry, df)
+        return df
+
+    def clear(self) -> None:
+        for entry, _ in self._entries():
+            entry.unlink(missing_ok=True)
+
+    def size_mb(self) -> float:
+        return sum(stat.st_size for _, stat in self._entries()) / 1024 ** 2
+
+    def _entry(self, filepath: Path, kwargs: dict) -> Path:
+        stat = filepath.stat()
+        source = _digest(filepath.resolve(), sorted(kwargs.items()))
+        version = _digest(stat.st_size, stat.st_mtime_ns)
+        return self.directory / f"{filepath.stem}-{source}-{version}{_SUFFIX}"
+
+    def _entries(self) -> list[tuple[Path, os.stat_result]]:
+        entries = []
+        for entry in self.directory.glob(f"*{_SUFFIX}"):
+            # Another thread or process may evict it in the meantime
+            try:
+                entries.append((entry, entry.stat()))
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def _write(self, entry: Path, df: pd.DataFrame) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # Earlier versions of the same file can never be hit again
+        stale_prefix = entry.name.rsplit("-", 1)[0]
+        for stale in self.directory.glob(f"{stale_prefix}-*{_SUFFIX}"):
+            stale.unlink(missing_ok=True)
+
+        # Write aside and rename, so a concurrent reader never sees half a file
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            feather.write_feather(pa.Table.from_pandas(df), tmp, compression="uncompressed")
+        except (pa.ArrowException, TypeError, ValueError):
+            # Columns Arrow cannot hold, e.g. objects of mixed types: not cached
+            tmp.unlink(missing_ok=True)
+            return
+        tmp.replace(entry)
+
+        if self.max_mb is not None:
+            self._evict(keep=entry)
+
+    def _evict(self, keep: Path) -> None:
+        entries = sorted(self._entries(), key=lambda item: item[1].st_mtime_ns)
+        total = sum(stat.st_size for _, stat in entries)
+        limit = self.max_mb * 1024 ** 2
+        for entry, stat in entries:
+            if total <= limit:
+                break
+            if entry == keep:
+                continue
+            entry.unlink(missing_ok=True)
+            total -= stat.st_size
+
+
+def _digest(*parts: object) -> str:
+    return hashlib.sha1(repr(parts).encode(), usedforsecurity=False).hexdigest()[:12]
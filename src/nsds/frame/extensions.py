@@ -1,12 +1,21 @@
-from collections.abc import Callable, Iterator
-from functools import partial, reduce
-from itertools import starmap
-
+import os
+from collections.abc import Callable, Iterable, Iterator
+from functools import partial
+from itertools import chain
+from operator import methodcaller
+from typing import IO, Literal
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 from pandas.core.generic import NDFrame
+from pyarrow import compute as pc
+from pyarrow import csv as pa_csv
+from pyarrow import feather
 
 from nsds._compat import TEXT_DTYPES
 from nsds._deps import require
+from nsds._parallel import ExecutorKind, ordered_map
 from nsds.utils.dates import datetime_utils as dtu
 from nsds.utils.introspect import parameter_names
 
@@ -15,6 +24,446 @@ def _display(obj: object) -> None:
     require("IPython.display", "notebook").display(obj)
 
 
+def _call_unpacked[T](func: Callable[..., T], args: Iterable) -> T:
+    # `starmap` for a pool, which needs a picklable function
+    return func(*args)
+
+
+def _apply_column_wise[T](df: pd.DataFrame,
+                         func: Callable[..., T],
+                         names: list[str],
+                         batch_size: int | None,
+                         show_progress: bool,
+                         n_jobs: int | None,
+                         executor: ExecutorKind) -> Iterator[T]:
+    # Column selection on its own, so that mixed dtypes are never boxed into
+    # a 2-D object array the way `.values` on the selection would
+    columns = [
+        pa.array(df[name].array) if isinstance(df[name].dtype, pd.ArrowDtype)
+        else df[name].to_numpy()
+        for name in names
+    ]
+    step = batch_size or max(len(df), 1)
+    batches = ([column[i:i + step] for column in columns] for i in range(0, len(df), step))
+
+    results = ordered_map(
+        partial(_call_unpacked, func),
+        batches,
+        max_workers=n_jobs,
+        executor=executor,
+    )
+    if show_progress:
+        total = -(-len(df) // step)
+        results = require("tqdm.auto", "notebook").tqdm(results, total=total)
+    return chain.from_iterable(results)
+
+
+_MISSING_CHUNK_ROWS = 1_000_000
+
+
+def _missing_counts(column: pd.Series,
+                    numeric: bool,
+                    text: bool) -> tuple[int, float, float]:
+    """ (isna, eq0, empty_str) for one column, NaN where a check does not apply """
+    if isinstance(column.dtype, pd.ArrowDtype):
+        array = pa.array(column.array)
+        return (
+            array.null_count,
+            _arrow_count_equal(array, 0) if numeric else np.nan,
+            _arrow_count_equal(array, "") if text else np.nan,
+        )
+
+    isna, eq0, empty_str = 0, 0, 0
+    for start in range(0, len(column), _MISSING_CHUNK_ROWS):
+        chunk = column.iloc[start:start + _MISSING_CHUNK_ROWS]
+        isna += chunk.isna().sum()
+        if numeric:
+            eq0 += chunk.eq(0).sum()
+        if text:
+            empty_str += chunk.eq("").sum()
+    return (
+        int(isna),
+        int(eq0) if numeric else np.nan,
+        int(empty_str) if text else np.nan,
+    )
+
+
+def _arrow_count_equal(array: pa.Array | pa.ChunkedArray, value: object) -> int:
+    value_type = _arrow_value_type(array.type)
+    return pc.sum(pc.equal(array, pa.scalar(value, type=value_type))).as_py() or 0
+
+
+def _arrow_value_type(arrow_type: pa.DataType) -> pa.DataType:
+    """ The type of the values, which for a dictionary are those it encodes """
+    return arrow_type.value_type if pa.types.is_dictionary(arrow_type) else arrow_type
+
+
+def _is_arrow_numeric(arrow_type: pa.DataType) -> bool:
+    arrow_type = _arrow_value_type(arrow_type)
+    return (
+        pa.types.is_integer(arrow_type)
+        or pa.types.is_floating(arrow_type)
+        or pa.types.is_decimal(arrow_type)
+    )
+
+
+def _is_arrow_text(arrow_type: pa.DataType) -> bool:
+    arrow_type = _arrow_value_type(arrow_type)
+    # `string_view` only exists from pyarrow 16
+    is_string_view = getattr(pa.types, "is_string_view", lambda _: False)
+    return (
+        pa.types.is_string(arrow_type)
+        or pa.types.is_large_string(arrow_type)
+        or is_string_view(arrow_type)
+    )
+
+
+def _all_arrow_backed(df: pd.DataFrame) -> bool:
+    # pyarrow tables need unique string column names
+    return (
+        len(df.columns) > 0
+        and df.columns.is_unique
+        and all(isinstance(name, str) for name in df.columns)
+        and all(isinstance(dtype, pd.ArrowDtype) for dtype in df.dtypes)
+    )
+
+
+def _arrow_group_sizes(df: pd.DataFrame, dropna: bool) -> pd.Series:
+    """ `groupby(all columns).size()`, sorted descending, as a pyarrow hash aggregation """
+    table = pa.table({name: pa.array(df[name].array) for name in df.columns})
+    if dropna:
+        table = table.drop_null()
+    sizes = (
+        table
+        .group_by(df.columns.tolist())
+        .aggregate([([], "count_all")])
+        .sort_by([("count_all", "descending")])
+    )
+
+    # Dictionary keys are decoded, since an index cannot hold one with nulls
+    keys = [
+        pd.arrays.ArrowExtensionArray(
+            pc.dictionary_decode(sizes[name])
+            if pa.types.is_dictionary(sizes[name].type) else sizes[name]
+        )
+        for name in df.columns
+    ]
+    if len(keys) == 1:
+        index = pd.Index(keys[0], name=df.columns[0])
+    else:
+        index = pd.MultiIndex.from_arrays(keys, names=df.columns.tolist())
+    return pd.Series(sizes["count_all"].to_numpy(), index=index, name="count")
+
+
+def _sorted_head(data: pd.Series | pd.DataFrame,
+                 n: int,
+                 by: str | list[str] | None = None,
+                 *,
+                 ascending: bool | list[bool] = True,
+                 **kwargs) -> pd.Series | pd.DataFrame:
+    """
+    `sort_values(...).head(n)` through `nsmallest` / `nlargest`, which select
+    in O(rows) and break ties by original order like a stable sort. Options
+    those cannot honour (mixed directions, `key`, `na_position`...) or dtypes
+    they reject fall back to the full sort.
+    """
+    if not isinstance(ascending, bool) and len(set(ascending)) == 1:
+        ascending = ascending[0]
+    if kwargs or not isinstance(ascending, bool):
+        return _full_sort_head(data, n, by, ascending, **kwargs)
+
+    select = data.nsmallest if ascending else data.nlargest
+    try:
+        result = select(n) if by is None else select(n, by)
+    except TypeError:
+        return _full_sort_head(data, n, by, ascending)
+
+    # Missing values are dropped by the selection but sorted last by
+    # `sort_values`, so they belong in the head when there are too few others
+    if len(result) < min(n, len(data)):
+        return _full_sort_head(data, n, by, ascending)
+    return result
+
+
+def _full_sort_head(data: pd.Series | pd.DataFrame,
+                    n: int,
+                    by: str | list[str] | None,
+                    ascending: bool | list[bool],
+                    **kwargs) -> pd.Series | pd.DataFrame:
+    args = () if by is None else (by,)
+    return data.sort_values(*args, ascending=ascending, **kwargs).head(n)
+
+
+def _estimated_bytes(values: pd.Series | pd.Index,
+                     sample_rows: int,
+                     rng: np.random.Generator) -> tuple[float, float]:
+    """ Deep size in bytes and the half-width of its 95% confidence interval """
+    def usage(deep: bool) -> int:
+        if isinstance(values, pd.Index):
+            return values.memory_usage(deep=deep)
+        return values.memory_usage(deep=deep, index=False)
+
+    slow = values.dtype == object or (
+        isinstance(values.dtype, pd.StringDtype) and values.dtype.storage == "python"
+    )
+    if not slow or isinstance(values, pd.MultiIndex) or len(values) <= sample_rows:
+        return float(usage(deep=True)), 0.0
+
+    n = len(values)
+    positions = rng.choice(n, size=sample_rows, replace=False)
+    sample = values[positions] if isinstance(values, pd.Index) else values.iloc[positions]
+    # What pandas adds up per object for `deep=True`
+    sizes = np.fromiter(map(methodcaller("__sizeof__"), sample.to_numpy(dtype=object)), float)
+
+    # Normal approximation, with the correction for sampling without replacement
+    standard_error = sizes.std(ddof=1) / np.sqrt(sample_rows) * np.sqrt((n - sample_rows) / (n - 1))
+    return usage(deep=False) + n * sizes.mean(), 1.96 * n * standard_error
+
+
+_ARROW_BOOL = pd.ArrowDtype(pa.bool_())
+_ARROW_STRING = pd.ArrowDtype(pa.string())
+
+
+def _compact(column: pd.Series,
+             float_tolerance: float,
+             max_category_ratio: float) -> pd.Series:
+    dtype = column.dtype
+    if len(column) == 0 or isinstance(dtype, pd.CategoricalDtype):
+        return column
+
+    if pd.api.types.is_bool_dtype(dtype):
+        return column if dtype == _ARROW_BOOL else column.astype(_ARROW_BOOL)
+    if pd.api.types.is_integer_dtype(dtype):
+        return _downcast_integers(column)
+    if pd.api.types.is_float_dtype(dtype):
+        return _downcast_floats(column, float_tolerance)
+
+    is_object = pd.api.types.is_object_dtype(dtype)
+    if is_object:
+        kind = pd.api.types.infer_dtype(column, skipna=True)
+        if kind == "boolean":
+            return column.astype(_ARROW_BOOL)
+        if kind != "string":
+            return column
+    elif not pd.api.types.is_string_dtype(dtype):
+        return column
+
+    if column.nunique() <= max_category_ratio * column.count():
+        return column.astype("category")
+    return column.astype(_ARROW_STRING) if is_object else column
+
+
+def _downcast_integers(column: pd.Series) -> pd.Series:
+    low, high = column.min(), column.max()
+    if pd.isna(low):
+        return column
+    # Unsigned columns stay unsigned, and only ever get narrower
+    prefix = "uint" if column.dtype.kind == "u" else "int"
+    for bits in (8, 16, 32):
+        name = f"{prefix}{bits}"
+        info = np.iinfo(name)
+        if bits // 8 >= column.dtype.itemsize:
+            break
+        if info.min <= low and high <= info.max:
+            return column.astype(_same_backend(column.dtype, name))
+    return column
+
+
+def _downcast_floats(column: pd.Series, tolerance: float) -> pd.Series:
+    if column.dtype.itemsize <= 4:
+        return column
+    values = column.to_numpy(dtype="float64", na_value=np.nan)
+    with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+        moved = np.abs(values.astype("float32") - values)
+        relative = np.where(moved == 0, 0, moved / np.abs(values))
+    if np.nanmax(relative, initial=0) > tolerance:
+        return column
+    return column.astype(_same_backend(column.dtype, "float32"))
+
+
+def _same_backend(dtype: object, numpy_name: str) -> object:
+    """ `numpy_name` as a NumPy, masked (nullable) or Arrow dtype, following `dtype` """
+    if isinstance(dtype, pd.ArrowDtype):
+        return pd.ArrowDtype(pa.from_numpy_dtype(np.dtype(numpy_name)))
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        nullable_name = (
+            f"UInt{numpy_name[4:]}" if numpy_name.startswith("uint") else numpy_name.capitalize()
+        )
+        return pd.api.types.pandas_dtype(nullable_name)
+    return np.dtype(numpy_name)
+
+
+def _explode_arrow(df: pd.DataFrame, ignore_index: bool) -> pd.DataFrame | None:
+    """
+    `df.explode(df.columns.tolist())` for frames of Arrow list columns, with
+    one flatten and at most one take per column. Returns None when some column
+    is not an Arrow list, or when element counts differ (pandas raises then).
+    """
+    if df.shape[1] == 0 or not df.columns.is_unique:
+        return None
+    if not all(_is_arrow_list(dtype) for dtype in df.dtypes):
+        return None
+    arrays = [pa.array(column.array) for _, column in df.items()]
+
+    # Like pandas, an empty or missing list still takes one row, filled with NA
+    lengths = [pc.list_value_length(array).fill_null(0).to_numpy() for array in arrays]
+    counts = np.maximum(lengths[0], 1)
+    if any(not np.array_equal(np.maximum(other, 1), counts) for other in lengths[1:]):
+        return None
+
+    columns = {}
+    for i, (array, length) in enumerate(zip(arrays, lengths, strict=True)):
+        flat = pc.list_flatten(array)
+        filled = np.repeat(length > 0, counts)
+        if not filled.all():
+            flat = flat.take(pa.array(np.cumsum(filled) - 1, mask=~filled))
+        columns[i] = pd.arrays.ArrowExtensionArray(flat)
+
+    index = None if ignore_index else df.index.take(np.repeat(np.arange(len(df)), counts))
+    result = pd.DataFrame(columns, index=index, copy=False)
+    result.columns = df.columns
+    return result
+
+
+def _is_arrow_list(dtype: object) -> bool:
+    # Not fixed-size lists, which pandas leaves as they are
+    return isinstance(dtype, pd.ArrowDtype) and (
+        pa.types.is_list(dtype.pyarrow_dtype) or pa.types.is_large_list(dtype.pyarrow_dtype)
+    )
+
+
+def _stamped_filename(data: NDFrame, filename: str, add_date_to_filename: bool | str) -> str:
+    if isinstance(add_date_to_filename, str):
+        try:
+            data[add_date_to_filename].dt  # noqa check column
+            return dtu.add_datetime_to_filename(filename, data[add_date_to_filename].max())
+        except (KeyError, AttributeError):
+            raise KeyError(f"No datetime column '{add_date_to_filename}'") from None
+
+    if add_date_to_filename:
+        return dtu.add_datetime_to_filename(filename, dtu.naive_utcnow)
+    return filename
+
+
+_BOM = "\ufeff".encode()
+
+
+class _KeepOpen:
+    """ Write-through to a file object, where closing only flushes it """
+
+    def __init__(self, handle: IO[bytes]):
+        self._handle = handle
+        self.closed = False
+
+    def write(self, data: bytes) -> int:
+        return self._handle.write(data)
+
+    def flush(self) -> None:
+        self._handle.flush()
+
+    def close(self) -> None:
+        self._handle.flush()
+        self.closed = True
+
+
+def _to_csv_pyarrow(data: pd.DataFrame,
+                    path: object,
+                    *,
+                    sep: str = ",",
+                    header: bool = True,
+                    index: bool = False,
+                    encoding: str = "utf_8_sig",
+                    compression: str | None = "infer",
+                    **kwargs) -> None:
+    if kwargs:
+        raise TypeError(f"Not supported with engine='pyarrow': {', '.join(kwargs)}")
+    normalized = encoding.lower().replace("-", "_")
+    if normalized not in {"utf_8", "utf8", "utf_8_sig"}:
+        raise ValueError(f"engine='pyarrow' only writes UTF-8, got encoding '{encoding}'")
+
+    if index:
+        # Leading columns with blank headers for unnamed levels, like pandas
+        data = data.reset_index(
+            names=[name or "" for name in data.index.names], allow_duplicates=True
+        )
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    write_options = pa_csv.WriteOptions(include_header=header, delimiter=sep)
+
+    # The stream compresses on the fly, detecting the codec from the suffix
+    # (`.gz`, `.zst`, ...) the way pandas' "infer" does
+    is_path = isinstance(path, str | os.PathLike)
+    if compression == "infer":
+        compression = "detect" if is_path else None
+    if not is_path:
+        # Closing the stream must not close the caller's file object
+        path = pa.PythonFile(_KeepOpen(path), mode="w")
+    with pa.output_stream(path, compression=compression) as stream:
+        if normalized == "utf_8_sig":
+            stream.write(_BOM)
+        pa_csv.write_csv(table, stream, write_options)
+
+
+_SKETCH_CHUNK_ROWS = 1_000_000
+_SKETCH_SLOTS_PER_KEY = 10
+
+
+def _heavy_hitters(data: pd.Series | pd.DataFrame,
+                   top_k: int,
+                   dropna: bool) -> tuple[pd.Series, int, int]:
+    """
+    Misra-Gries summary over hashed rows, fed one chunk at a time and capped
+    at `top_k * _SKETCH_SLOTS_PER_KEY` keys, so memory does not grow with the
+    number of distinct rows. Returns the `top_k` lower-bound counts, the number
+    of rows counted, and the most any count can be short by (at most
+    rows / (slots + 1)).
+    """
+    if not isinstance(data, pd.Series | pd.DataFrame):
+        raise TypeError
+    slots = top_k * _SKETCH_SLOTS_PER_KEY
+
+    counts = pd.Series(dtype="int64")       # row hash -> count
+    first_seen = pd.Series(dtype="int64")   # row hash -> position of a row with it
+    total, error = 0, 0
+    for start in range(0, len(data), _SKETCH_CHUNK_ROWS):
+        chunk = data.iloc[start:start + _SKETCH_CHUNK_ROWS]
+        hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        positions = np.arange(start, start + len(chunk))
+        if dropna:
+            notna = chunk.notna()
+            rows_kept = (notna if notna.ndim == 1 else notna.all(axis=1)).to_numpy()
+            hashes, positions = hashes[rows_kept], positions[rows_kept]
+
+        # Hash-based, so the chunk never gets sorted
+        codes, keys = pd.factorize(hashes)
+        chunk_first_seen = np.empty(len(keys), dtype="int64")
+        chunk_first_seen[codes[::-1]] = positions[::-1]
+        total += len(hashes)
+
+        counts = counts.add(pd.Series(np.bincount(codes), index=keys), fill_value=0)
+        chunk_first_seen = pd.Series(chunk_first_seen, index=keys)
+        # Not combined with the initial empty Series, which pandas 2 warns about
+        first_seen = (
+            chunk_first_seen if start == 0 else first_seen.combine_first(chunk_first_seen)
+        )
+        if len(counts) > slots:
+            # Subtract the (slots + 1)-th largest count from every key, dropping
+            # the ones that reach zero
+            threshold = np.partition(counts.to_numpy(), -(slots + 1))[-(slots + 1)]
+            counts = counts[counts > threshold] - threshold
+            first_seen = first_seen[counts.index]
+            error += int(threshold)
+
+    top = counts.nlargest(top_k)
+    rows = data.iloc[first_seen[top.index].to_numpy()]
+    if isinstance(rows, pd.Series):
+        index = pd.Index(rows, name=rows.name)
+    elif rows.shape[1] == 1:
+        index = pd.Index(rows.iloc[:, 0])
+    else:
+        index = pd.MultiIndex.from_frame(rows)
+    return pd.Series(top.to_numpy(dtype="int64"), index=index, name="count"), total, error
+
+
 class NDFrameExtensions(NDFrame):
     """
     Extra methods that `install()` attaches to `pd.DataFrame` and `pd.Series`.
@@ -26,29 +475,141 @@ class NDFrameExtensions(NDFrame):
     def apply_row_wise[T](self,
                           func: Callable[..., T],
                           show_progress: bool = False,
+                          n_jobs: int | None = 1,
+                          executor: ExecutorKind = "process",
+                          chunksize: int = 1000,
+                          vectorized: bool = False,
+                          batch_size: int | None = None,
                           **kwargs) -> Iterator[T]:
         """
         Infer non-keyword-only arguments from function signature
-        to specify dataframe columns
+        to specify dataframe columns.
+
+        With `n_jobs` other than 1 the rows are sent to a pool in chunks of
+        `chunksize` (`None` uses every core). Results still come back lazily
+        and in order. A process pool needs `func` to be importable from a
+        module file: under the spawn start method, the default on macOS and
+        Windows, a function defined in a notebook or in `__main__` breaks the
+        pool. Use `executor="thread"` for those.
+
+        With `vectorized=True`, `func` is written over arrays instead: it is
+        called with whole columns - NumPy arrays, or pyarrow arrays for
+        Arrow-backed columns - and must return one value per row. A
+        `batch_size` calls it on slices of that many rows, which the pool can
+        then share.
         """
+        if batch_size is not None and not vectorized:
+            raise ValueError("`batch_size` only applies with `vectorized=True`")
         if any(kwargs):
             func = partial(func, **kwargs)
-        values = self[parameter_names(func)].values
-        if show_progress:
+        names = parameter_names(func)
+        if vectorized:
+            return _apply_column_wise(
+                self, func, names, batch_size, show_progress, n_jobs, executor
+            )
+
+        values = self[names].values
+        if show_progress and n_jobs == 1:
             values = require("tqdm.auto", "notebook").tqdm(values)
-        return starmap(func, values)
+        results = ordered_map(
+            partial(_call_unpacked, func),
+            values,
+            max_workers=n_jobs,
+            executor=executor,
+            chunksize=chunksize,
+        )
+        if show_progress and n_jobs != 1:
+            # The pool reads rows ahead, so count results as they come back
+            results = require("tqdm.auto", "notebook").tqdm(results, total=len(values))
+        return results
 
     def explode_all(self, *args, **kwargs) -> NDFrame:
+        """
+        `explode` on every column. A DataFrame whose columns are all Arrow
+        lists is flattened in Arrow instead of row by row.
+        """
         if isinstance(self, pd.DataFrame):
+            if not args and set(kwargs) <= {"ignore_index"}:
+                result = _explode_arrow(self, kwargs.get("ignore_index", False))
+                if result is not None:
+                    return result
             kwargs |= {"column": self.columns.tolist()}
         return self.explode(*args, **kwargs)
 
-    def memory_mb(self) -> pd.Series | float:
-        return self.memory_usage(deep=True) / 1024 ** 2
+    def memory_mb(self,
+                  mode: Literal["exact", "estimate"] = "exact",
+                  sample_rows: int = 10_000,
+                  seed: int | None = 0) -> pd.Series | pd.DataFrame | float:
+        """
+        Deep memory usage in MB.
+
+        `mode="estimate"` skips the walk over every Python object: object and
+        Python-string columns (and index) measure `sample_rows` random values
+        and extrapolate, everything else is still exact. The result then has
+        the estimate and its 95% confidence interval as `mb`, `low` and `high`,
+        one row per column for a DataFrame.
+        """
+        if mode == "exact":
+            return self.memory_usage(deep=True) / 1024 ** 2
+        if mode != "estimate":
+            raise ValueError(f"`mode` must be 'exact' or 'estimate', got '{mode}'")
+
+        rng = np.random.default_rng(seed)
+        parts = [("Index", self.index)]
+        parts += list(self.items()) if isinstance(self, pd.DataFrame) else [(self.name, self)]
+        estimates = pd.DataFrame(
+            [_estimated_bytes(values, sample_rows, rng) for _, values in parts],
+            index=[name for name, _ in parts],
+            columns=["bytes", "margin"],
+        )
+        result = pd.DataFrame({
+            "mb": estimates["bytes"],
+            "low": estimates["bytes"] - estimates["margin"],
+            "high": estimates["bytes"] + estimates["margin"],
+        }) / 1024 ** 2
+        if isinstance(self, pd.Series):
+            # Like the exact mode, which counts the index in a Series' total
+            return result.sum()
+        return result
+
+    def optimize_dtypes(self,
+                        float_tolerance: float = 0.0,
+                        max_category_ratio: float = 0.5,
+                        report: bool = False) -> NDFrame | tuple[NDFrame, pd.DataFrame]:
+        """
+        Shrink every column to a more compact dtype:
+        - integers, nullable too, to the smallest type of the same signedness
+          that holds them, never to a wider one;
+        - floats to 32 bits if no value moves by more than `float_tolerance`,
+          relative (the default only allows exact conversions);
+        - strings to `category` when at most `max_category_ratio` of the values
+          are distinct, and object strings to Arrow strings otherwise;
+        - booleans to bit-packed Arrow booleans.
+
+        With `report=True`, also returns each column's dtype and `memory_mb`
+        before and after.
+        """
+        data = self.to_frame() if isinstance(self, pd.Series) else self
+        compacted = data.copy(deep=False)
+        for i in range(data.shape[1]):
+            compacted.isetitem(i, _compact(data.iloc[:, i], float_tolerance, max_category_ratio))
+        result = compacted.iloc[:, 0] if isinstance(self, pd.Series) else compacted
+
+        if not report:
+            return result
+        return result, pd.DataFrame({
+            "dtype_before": data.dtypes.astype(str).to_numpy(),
+            "dtype_after": compacted.dtypes.astype(str).to_numpy(),
+            "mb_before": data.memory_usage(index=False, deep=True).to_numpy() / 1024 ** 2,
+            "mb_after": compacted.memory_usage(index=False, deep=True).to_numpy() / 1024 ** 2,
+        }, index=data.columns)
 
     def missing(self: pd.DataFrame | pd.Series) -> pd.DataFrame:
         """
-        Detailed report on the missing values
+        Detailed report on the missing values.
+
+        Works one column at a time, in chunks of rows (or with pyarrow compute
+        on Arrow-backed columns), so the extra memory stays bounded.
         """
 
         # Series doesn't have .select_dtypes method
@@ -57,22 +618,38 @@ class NDFrameExtensions(NDFrame):
         else:
             data = self
 
-        result = reduce(
-            lambda left, right: pd.merge(
-                left, right, left_index=True, right_index=True, how="left"
-            ),
-            (
-                data.isna().sum().rename("isna"),
-                data.select_dtypes((int, float)).eq(0).sum().rename("eq0"),
-                data.select_dtypes(TEXT_DTYPES).eq("").sum().rename("empty_str"),
-            )
+        # Dtype selection on an empty slice, so that no data gets copied
+        numeric = set(data.iloc[:0].select_dtypes((int, float)).columns)
+        text = set(data.iloc[:0].select_dtypes(TEXT_DTYPES).columns)
+        # Arrow columns go by their pyarrow type alone: `select_dtypes` misses
+        # Arrow strings before pandas 3, and takes decimals for text
+        for name, dtype in data.dtypes.items():
+            if isinstance(dtype, pd.ArrowDtype):
+                numeric.discard(name)
+                text.discard(name)
+                if _is_arrow_numeric(dtype.pyarrow_dtype):
+                    numeric.add(name)
+                elif _is_arrow_text(dtype.pyarrow_dtype):
+                    text.add(name)
+
+        counts = pd.DataFrame(
+            [
+                _missing_counts(data.iloc[:, i], name in numeric, name in text)
+                for i, name in enumerate(data.columns)
+            ],
+            index=data.columns,
+            columns=["isna", "eq0", "empty_str"],
         )
-        result = result.dropna(axis=1, how="all")
-        i = 1
-        for col in result.columns:
-            result.insert(i, f"{col}_pct", result[col].div(data.shape[0]).mul(100).round(2))
-            i += 2
-        return result
+
+        result = {}
+        for col, count in counts.items():
+            if count.isna().all():
+                continue
+            if not count.isna().any():
+                count = count.astype(int)
+            result[col] = count
+            result[f"{col}_pct"] = count.div(data.shape[0]).mul(100).round(2)
+        return pd.DataFrame(result, index=data.columns)
 
     def preview(self, min_rows: int = 4):
         context = ("display.min_rows", min_rows, "display.max_rows", min_rows)
@@ -88,20 +665,29 @@ class NDFrameExtensions(NDFrame):
         with pd.option_context(*context):
             _display(self.iloc[:nrows])
 
-    def sort(self, *args, **kwargs) -> NDFrame:
+    def sort(self, *args, n: int | None = None, **kwargs) -> NDFrame:
+        """
+        `sort_values`, or with `n` only its first `n` rows, picked by partial
+        selection instead of a full sort
+        """
+        if n is not None:
+            return _sorted_head(self, n, *args, **kwargs)
         return self.sort_values(*args, **kwargs)
 
-    def sortd(self, *args, **kwargs) -> NDFrame:
+    def sortd(self, *args, n: int | None = None, **kwargs) -> NDFrame:
         if kwargs.get("ascending") is not None:
             raise ValueError(
                 "`sortd` is always descending. "
                 "If you want to use the keyword argument, use `sort_values`"
             )
+        if n is not None:
+            return _sorted_head(self, n, *args, ascending=False, **kwargs)
         return self.sort_values(*args, ascending=False, **kwargs)
 
     def to_csv_(self,
                 *args,
                 add_date_to_filename: bool | str = False,
+                engine: Literal["pandas", "pyarrow"] = "pandas",
                 **kwargs):
         """
         Saves to csv with an encoding that is more reliable for Excel.
@@ -110,43 +696,110 @@ class NDFrameExtensions(NDFrame):
         be added to the filename. This argument can also be a name of a datetime
         column (only for a DataFrame) - in such case, its maximum value will be
         used.
+
+        `engine="pyarrow"` uses pyarrow's multithreaded CSV writer, many times
+        faster on large frames, and compresses while streaming (by the filename
+        suffix, or `compression="gzip"` / `"zstd"`). It supports `sep`,
+        `header`, `index`, `encoding` (UTF-8 only) and `compression`. Arrow
+        formats some values differently: it quotes every string, writes
+        booleans as `true` and keeps the fractional seconds of timestamps.
         """
+        if engine not in ("pandas", "pyarrow"):
+            raise ValueError(f"`engine` must be 'pandas' or 'pyarrow', got '{engine}'")
 
         kwargs.setdefault("index", False)
         kwargs.setdefault("encoding", "utf_8_sig")
-        filename = kwargs.pop("path_or_buf", None) or args[0]
-
-        if isinstance(add_date_to_filename, str):
-            try:
-                self[add_date_to_filename].dt  # noqa check column
-                filename = dtu.add_datetime_to_filename(
-                    filename,
-                    self[add_date_to_filename].max()
-                )
-            except (KeyError, AttributeError):
-                raise KeyError(f"No datetime column '{add_date_to_filename}'") from None
+        filename = _stamped_filename(
+            self, kwargs.pop("path_or_buf", None) or args[0], add_date_to_filename
+        )
 
-        elif add_date_to_filename:
-            filename = dtu.add_datetime_to_filename(filename, dtu.naive_utcnow)
+        if engine == "pyarrow":
+            if args[1:]:
+                raise TypeError("engine='pyarrow' takes its options as keyword arguments")
+            data = self.to_frame() if isinstance(self, pd.Series) else self
+            return _to_csv_pyarrow(data, filename, **kwargs)
 
         args = (filename, *args[1:])
 
         return self.to_csv(*args, **kwargs)
 
+    def to_feather_(self,
+                    path: str,
+                    add_date_to_filename: bool | str = False,
+                    *,
+                    compression: Literal["zstd", "lz4", "uncompressed"] | None = None,
+                    chunksize: int | None = None,
+                    **kwargs) -> None:
+        """
+        Saves to Feather (Arrow IPC), which keeps the dtypes and the index and
+        can be memory-mapped on read.
+
+        `add_date_to_filename` works as in `to_csv_`. `compression` defaults to
+        LZ4, and `chunksize` is the number of rows per record batch. `kwargs`
+        go to `pyarrow.feather.write_feather`.
+        """
+        data = self.to_frame() if isinstance(self, pd.Series) else self
+        path = _stamped_filename(self, path, add_date_to_filename)
+        feather.write_feather(data, path, compression=compression, chunksize=chunksize, **kwargs)
+
+    def to_parquet_(self,
+                    path: str,
+                    add_date_to_filename: bool | str = False,
+                    *,
+                    compression: str | None = "snappy",
+                    row_group_size: int | None = None,
+                    partition_cols: list[str] | None = None,
+                    **kwargs) -> None:
+        """
+        Saves to Parquet with the pyarrow engine, keeping the dtypes.
+
+        `add_date_to_filename` works as in `to_csv_`. `row_group_size` caps the
+        rows per row group. With `partition_cols`, `path` becomes a directory
+        with one `column=value` subdirectory per group (the columns move from
+        the files to the paths). `kwargs` go to `pd.DataFrame.to_parquet`.
+        """
+        data = self.to_frame() if isinstance(self, pd.Series) else self
+        path = _stamped_filename(self, path, add_date_to_filename)
+        data.to_parquet(
+            path,
+            engine="pyarrow",
+            compression=compression,
+            partition_cols=partition_cols,
+            row_group_size=row_group_size,
+            **kwargs,
+        )
+
     def vc(self,
            as_index: bool = True,
            dropna: bool = False,
            min_bin_size: int = 1,
-           show_cumulative: bool = False) -> pd.DataFrame:
+           show_cumulative: bool = False,
+           top_k: int | None = None,
+           approx: bool = False) -> pd.DataFrame:
         """
         Advanced version of pandas `value_counts`:
         - Also works on DataFrames;
         - Shows both count and percentage;
-        - Can show cumulative values.
+        - Can show cumulative values;
+        - Can keep only the `top_k` most frequent values.
+
+        A frame whose columns are all Arrow-backed is grouped in pyarrow,
+        without a round-trip through NumPy.
+
+        `approx=True` (needs `top_k`) counts hashed rows in a single pass with
+        a fixed-size Misra-Gries summary instead of a full groupby and sort.
+        Each count is then a lower bound, short of the true count by at most
+        `count_error`, which is shared by all rows.
         """
 
-        if isinstance(self, pd.Series):
+        if approx:
+            if top_k is None:
+                raise ValueError("`approx=True` needs `top_k`")
+            count, total, error = _heavy_hitters(self, top_k, dropna)
+        elif isinstance(self, pd.Series):
             count = self.value_counts(dropna=dropna)
+        elif isinstance(self, pd.DataFrame) and _all_arrow_backed(self):
+            count = _arrow_group_sizes(self, dropna)
         elif isinstance(self, pd.DataFrame):
             count = (
                 self
@@ -158,7 +811,12 @@ class NDFrameExtensions(NDFrame):
         else:
             raise TypeError
 
-        percentage = (count / sum(count) * 100)
+        if not approx:
+            total = count.sum()
+            if top_k is not None:
+                count = count.head(top_k)
+
+        percentage = (count / total * 100)
         df = pd.DataFrame({
             "count": count,
             "percentage": percentage,
@@ -168,6 +826,9 @@ class NDFrameExtensions(NDFrame):
             df.insert(1, "count_cumulative", count.cumsum())
             df.insert(3, "percentage_cumulative", percentage.cumsum())
 
+        if approx:
+            df["count_error"] = error
+
         if min_bin_size > 1:
             filt = df["count"] >= min_bin_size
             df = df[filt]
@@ -1,24 +1,293 @@
-from functools import partial, reduce
+import copy
+from collections.abc import Iterator, Sequence
+from functools import partial
 from pathlib import Path
+from typing import IO, Literal, overload
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+from pyarrow import compute as pc
+from pyarrow import csv as pa_csv
+from pyarrow import dataset as ds
 
-read_csv_pyarrow = partial(pd.read_csv, dtype_backend="pyarrow", engine="pyarrow")
+from nsds._parallel import ExecutorKind, ordered_map
+from nsds.frame.cache import CsvCache
+
+
+def read_csv_pyarrow(filepath_or_buffer: str | Path | IO,
+                     *,
+                     cache: CsvCache | None = None,
+                     **kwargs) -> pd.DataFrame:
+    """
+    `pd.read_csv` with the pyarrow engine and Arrow-backed columns.
+    A `cache` (which needs a path, not a buffer) skips the parse while the
+    file is unchanged.
+    """
+    kwargs = {"dtype_backend": "pyarrow", "engine": "pyarrow"} | kwargs
+    if cache is None:
+        return pd.read_csv(filepath_or_buffer, **kwargs)
+    return cache.read_csv(filepath_or_buffer, **kwargs)
 
 
 def read_csvs(file_mask: str,
               add_filename_column: bool = False,
+              *,
+              max_workers: int | None = 1,
+              executor: ExecutorKind = "thread",
+              cache: CsvCache | None = None,
               **kwargs) -> pd.DataFrame:
+    """
+    Read every file matching `file_mask` into one DataFrame, in glob order.
+    With a `cache`, unchanged files are loaded from it instead of parsed.
+
+    With `max_workers` other than 1 the files are parsed concurrently (`None`
+    lets the executor choose). Threads scale well with `engine="pyarrow"`,
+    which releases the GIL while parsing; the default C engine holds it for
+    part of the work, so `executor="process"` can be faster there.
+    """
+    read = partial(_read_csv, add_filename_column=add_filename_column, cache=cache, **kwargs)
+    parts = list(ordered_map(
+        read,
+        _glob(file_mask),
+        max_workers=max_workers,
+        executor=executor,
+    ))
+
+    # One concat over all the parts allocates the result once. Folding them in
+    # pairwise would copy the accumulated frame again for every file.
+    return pd.concat(parts, ignore_index=True)
+
+
+class IncrementalCsvReader:
+    """
+    `read_csvs` for a folder that keeps growing: each `read()` only parses
+    the files that are new or changed (by size and mtime) since the previous
+    call and appends them to the result it kept from that call.
 
-    def _concat(df1: pd.DataFrame, df2: pd.DataFrame) -> pd.DataFrame:
-        return pd.concat([df1, df2], ignore_index=True)
+    Rows of unchanged files keep their order, and files parsed later come
+    after them, so the row order can differ from a fresh `read_csvs`. The
+    returned frame is the reader's own state - copy it before modifying it
+    in place.
+    """
 
-    df_generator = (
-        (
-            pd.read_csv(filepath, **kwargs)
-            .assign(**{"_file": filepath.name} if add_filename_column else {})
+    def __init__(self,
+                 file_mask: str,
+                 add_filename_column: bool = False,
+                 *,
+                 max_workers: int | None = 1,
+                 executor: ExecutorKind = "thread",
+                 cache: CsvCache | None = None,
+                 **kwargs):
+        self.file_mask = file_mask
+        self.max_workers = max_workers
+        self.executor = executor
+        self.manifest: dict[Path, tuple[int, int]] = {}
+        self._read = partial(
+            _read_csv, add_filename_column=add_filename_column, cache=cache, **kwargs
         )
-        for filepath in Path().glob(file_mask)
+        self._row_counts: dict[Path, int] = {}
+        self._result: pd.DataFrame | None = None
+
+    def read(self) -> pd.DataFrame:
+        current = {filepath: _file_state(filepath) for filepath in Path().glob(self.file_mask)}
+        if not current:
+            raise FileNotFoundError(f"No files match '{self.file_mask}'")
+
+        kept = {
+            filepath: state for filepath, state in self.manifest.items()
+            if current.get(filepath) == state
+        }
+        to_read = [filepath for filepath in current if filepath not in kept]
+        if not to_read and len(kept) == len(self.manifest):
+            return self._result
+
+        parts = list(ordered_map(
+            self._read,
+            to_read,
+            max_workers=self.max_workers,
+            executor=self.executor,
+        ))
+        row_counts = (
+            {filepath: self._row_counts[filepath] for filepath in kept}
+            | {filepath: len(part) for filepath, part in zip(to_read, parts, strict=True)}
+        )
+        if kept:
+            previous = self._result
+            if len(kept) < len(self.manifest):
+                # Drop the rows of files that have changed or disappeared since
+                rows_kept = np.repeat(
+                    [filepath in kept for filepath in self.manifest],
+                    list(self._row_counts.values()),
+                )
+                previous = previous[rows_kept]
+            parts.insert(0, previous)
+
+        self._result = pd.concat(parts, ignore_index=True)
+        self.manifest = kept | {filepath: current[filepath] for filepath in to_read}
+        self._row_counts = row_counts
+        return self._result
+
+
+def _file_state(filepath: Path) -> tuple[int, int]:
+    stat = filepath.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _read_csv(filepath: Path,
+              add_filename_column: bool,
+              cache: CsvCache | None,
+              **kwargs) -> pd.DataFrame:
+    # Module level, so that a process pool can pickle it
+    read = pd.read_csv if cache is None else cache.read_csv
+    return (
+        read(filepath, **kwargs)
+        .assign(**{"_file": filepath.name} if add_filename_column else {})
     )
 
-    return reduce(_concat, df_generator)
+
+def scan_csvs(file_mask: str,
+              columns: Sequence[str] | None = None,
+              filter: pc.Expression | None = None,
+              add_filename_column: bool = False,
+              *,
+              schema: pa.Schema | None = None,
+              **kwargs) -> pd.DataFrame:
+    """
+    Read the files matching `file_mask` with `pyarrow.dataset`, in glob order,
+    keeping only `columns` and the rows that pass `filter`, for example
+    `pc.field("day") >= "2026-01-01"`.
+
+    Both are applied batch by batch while scanning, so unused columns and
+    rejected rows never reach pandas. The result is Arrow-backed.
+
+    Every file is parsed with the same `schema`, by default the one
+    `infer_csv_schema` finds. `kwargs` go to `pyarrow.dataset.CsvFileFormat`
+    (`read_options`, `parse_options`, `convert_options`).
+    """
+    filepaths = _glob(file_mask)
+    if schema is None:
+        schema = infer_csv_schema(file_mask, **kwargs)
+
+    dataset = ds.dataset(filepaths, schema=schema, format=ds.CsvFileFormat(**kwargs))
+    tables = []
+    for fragment in dataset.get_fragments():
+        table = fragment.to_table(columns=columns, filter=filter, schema=dataset.schema)
+        if add_filename_column:
+            filename = Path(fragment.path).name
+            table = table.append_column("_file", _filename_array(filename, table.num_rows))
+        tables.append(table)
+
+    return pa.concat_tables(tables).to_pandas(types_mapper=pd.ArrowDtype)
+
+
+@overload
+def iter_csvs(file_mask: str,
+              batch_rows: int = ...,
+              add_filename_column: bool = ...,
+              *,
+              as_batches: Literal[False] = False,
+              schema: pa.Schema | None = None,
+              **kwargs) -> Iterator[pd.DataFrame]: ...
+@overload
+def iter_csvs(file_mask: str,
+              batch_rows: int = ...,
+              add_filename_column: bool = ...,
+              *,
+              as_batches: Literal[True],
+              schema: pa.Schema | None = None,
+              **kwargs) -> Iterator[pa.RecordBatch]: ...
+def iter_csvs(file_mask: str,
+              batch_rows: int = 100_000,
+              add_filename_column: bool = False,
+              *,
+              as_batches: bool = False,
+              schema: pa.Schema | None = None,
+              **kwargs) -> Iterator[pd.DataFrame] | Iterator[pa.RecordBatch]:
+    """
+    Stream every file matching `file_mask`, in glob order, as chunks of at most
+    `batch_rows` rows, so that memory stays flat however large the input is.
+
+    Chunks are Arrow-backed DataFrames, or RecordBatches with `as_batches=True`.
+    Every file is parsed with the same `schema`, by default the one
+    `infer_csv_schema` finds. Types are only sampled from the start of each
+    file, so pin them with `schema` if later rows may disagree. `kwargs` go to
+    `pyarrow.csv.open_csv` (`read_options`, `parse_options`, `convert_options`).
+    """
+    if batch_rows < 1:
+        raise ValueError(f"`batch_rows` must be positive, got {batch_rows}")
+    if schema is None:
+        schema = infer_csv_schema(file_mask, **kwargs)
+
+    # Explicit `column_types` win over the schema
+    convert_options = copy.copy(kwargs.get("convert_options") or pa_csv.ConvertOptions())
+    convert_options.column_types = (
+        dict(zip(schema.names, schema.types, strict=True)) | convert_options.column_types
+    )
+    kwargs["convert_options"] = convert_options
+
+    return _iter_csvs(file_mask, batch_rows, add_filename_column, as_batches, **kwargs)
+
+
+def _iter_csvs(file_mask: str,
+               batch_rows: int,
+               add_filename_column: bool,
+               as_batches: bool,
+               **kwargs) -> Iterator[pd.DataFrame] | Iterator[pa.RecordBatch]:
+    for filepath in Path().glob(file_mask):
+        with pa_csv.open_csv(filepath, **kwargs) as reader:
+            for block in reader:
+                for offset in range(0, block.num_rows, batch_rows):
+                    batch = block.slice(offset, batch_rows)
+                    if add_filename_column:
+                        batch = _with_filename(batch, filepath.name)
+                    yield batch if as_batches else batch.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def _with_filename(batch: pa.RecordBatch, filename: str) -> pa.RecordBatch:
+    return pa.RecordBatch.from_arrays(
+        [*batch.columns, _filename_array(filename, batch.num_rows)],
+        names=[*batch.schema.names, "_file"],
+    )
+
+
+def infer_csv_schema(file_mask: str, **kwargs) -> pa.Schema:
+    """
+    One Arrow schema for all the files matching `file_mask`, merged from the
+    types pyarrow infers on the first block of each.
+
+    Where files disagree the type is widened: an all-null column takes the
+    other file's type and integers become doubles. Anything else that cannot
+    be reconciled becomes a string. `kwargs` go to `pyarrow.csv.open_csv`.
+    """
+    types: dict[str, pa.DataType] = {}
+    for filepath in _glob(file_mask):
+        with pa_csv.open_csv(filepath, **kwargs) as reader:
+            for field in reader.schema:
+                previous = types.get(field.name)
+                types[field.name] = (
+                    field.type if previous is None else _merge_types(previous, field.type)
+                )
+    return pa.schema(types.items())
+
+
+def _merge_types(left: pa.DataType, right: pa.DataType) -> pa.DataType:
+    try:
+        merged = pa.unify_schemas(
+            [pa.schema([("_", left)]), pa.schema([("_", right)])],
+            promote_options="permissive",
+        )
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        return pa.string()
+    return merged.field("_").type
+
+
+def _glob(file_mask: str) -> list[Path]:
+    filepaths = list(Path().glob(file_mask))
+    if not filepaths:
+        raise FileNotFoundError(f"No files match '{file_mask}'")
+    return filepaths
+
+
+def _filename_array(filename: str, length: int) -> pa.Array:
+    return pa.array([filename] * length, pa.string())
@@ -0,0 +1,164 @@
+from collections.abc import Hashable, Iterable, Sequence
+from typing import Self
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from numpy.typing import ArrayLike
+
+# Smaller magnitudes are counted as zero, so that every bin index stays finite
+_MIN_MAGNITUDE = np.finfo(np.float64).tiny
+
+
+class _Bins:
+    """ Dense counts for consecutive bin indexes, starting at `offset` """
+
+    def __init__(self):
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    def add(self, indexes: np.ndarray) -> None:
+        if len(indexes):
+            low = indexes.min()
+            self._add_counts(low, np.bincount(indexes - low))
+
+    def merge(self, other: Self) -> None:
+        if len(other.counts):
+            self._add_counts(other.offset, other.counts)
+
+    def _add_counts(self, offset: int, counts: np.ndarray) -> None:
+        if not len(self.counts):
+            self.offset, self.counts = int(offset), counts.astype(np.int64)
+            return
+        low = min(self.offset, offset)
+        high = max(self.offset + len(self.counts), offset + len(counts))
+        if low < self.offset or high > self.offset + len(self.counts):
+            grown = np.zeros(high - low, dtype=np.int64)
+            grown[self.offset - low:self.offset - low + len(self.counts)] = self.counts
+            self.offset, self.counts = int(low), grown
+        self.counts[offset - self.offset:offset - self.offset + len(counts)] += counts
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch (DDSketch) for data that does not fit in memory.
+
+    Every quantile it answers is within `relative_accuracy` of a true value at
+    that rank: `0.01` means 99.0 is reported for 100 somewhere between 99 and
+    101. The guarantee holds in the tails too, so any `percentiles` grid is
+    safe to ask for. Memory depends only on the range of magnitudes seen,
+    never on the number of values - a few thousand counts in practice.
+
+    Feed it chunks with `update` (or build it with `from_chunks`), combine
+    sketches built elsewhere, e.g. in other processes, with `merge`, then call
+    `quantile`. NaN and missing values are skipped.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(
+                f"`relative_accuracy` must be between 0 and 1, got {relative_accuracy}"
+            )
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self._gamma)
+        self._positive = _Bins()
+        self._negative = _Bins()
+        self._zeros = 0
+        self._min = np.inf
+        self._max = -np.inf
+
+    @classmethod
+    def from_chunks(cls,
+                    chunks: Iterable,
+                    column: Hashable | None = None,
+                    relative_accuracy: float = 0.01) -> Self:
+        """
+        A sketch of every chunk, e.g. from `iter_csvs`. With `column`, each
+        chunk (a DataFrame or RecordBatch) contributes that column.
+        """
+        sketch = cls(relative_accuracy)
+        for chunk in chunks:
+            sketch.update(chunk if column is None else chunk[column])
+        return sketch
+
+    @property
+    def count(self) -> int:
+        return self._positive.total + self._negative.total + self._zeros
+
+    def update(self, values: ArrayLike | pd.Series | pa.Array | pa.ChunkedArray) -> Self:
+        values = _as_float_array(values)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        if np.isinf(values).any():
+            raise ValueError("Cannot sketch infinite values")
+
+        self._min = min(self._min, values.min())
+        self._max = max(self._max, values.max())
+        magnitudes = np.abs(values)
+        nonzero = magnitudes >= _MIN_MAGNITUDE
+        self._zeros += int(len(values) - nonzero.sum())
+        indexes = np.ceil(np.log(magnitudes[nonzero]) / self._log_gamma).astype(np.int64)
+        positive = values[nonzero] > 0
+        self._positive.add(indexes[positive])
+        self._negative.add(indexes[~positive])
+        return self
+
+    def merge(self, other: Self) -> Self:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError(
+                "Cannot merge sketches with different `relative_accuracy`: "
+                f"{self.relative_accuracy} and {other.relative_accuracy}"
+            )
+        self._positive.merge(other._positive)
+        self._negative.merge(other._negative)
+        self._zeros += other._zeros
+        self._min = min(self._min, other._min)
+        self._max = max(self._max, other._max)
+        return self
+
+    def quantile(self, q: float | Sequence[float] = 0.5) -> float | pd.Series:
+        """
+        Like `pd.Series.quantile`: a float for a single `q`, otherwise a Series
+        indexed by `q`. NaN while the sketch is empty.
+        """
+        quantiles = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        if ((quantiles < 0) | (quantiles > 1)).any():
+            raise ValueError(f"Quantiles must be between 0 and 1, got {q}")
+
+        if not self.count:
+            values = np.full(len(quantiles), np.nan)
+        else:
+            # Bins in ascending order of value: negatives by falling magnitude,
+            # then zeros, then positives
+            counts = np.concatenate([
+                self._negative.counts[::-1], [self._zeros], self._positive.counts,
+            ])
+            bin_values = np.concatenate([
+                -self._bin_values(self._negative)[::-1], [0.0], self._bin_values(self._positive),
+            ])
+            ranks = quantiles * (self.count - 1)
+            bins = np.searchsorted(np.cumsum(counts), ranks, side="right")
+            values = np.clip(bin_values[bins], self._min, self._max)
+
+        if np.ndim(q) == 0:
+            return float(values[0])
+        return pd.Series(values, index=pd.Index(quantiles))
+
+    def _bin_values(self, bins: _Bins) -> np.ndarray:
+        # The point of each bin within `relative_accuracy` of both its edges
+        indexes = np.arange(bins.offset, bins.offset + len(bins.counts))
+        return 2 * self._gamma ** indexes / (self._gamma + 1)
+
+
+def _as_float_array(values: ArrayLike | pd.Series | pa.Array | pa.ChunkedArray) -> np.ndarray:
+    if isinstance(values, pa.Array | pa.ChunkedArray):
+        values = values.to_numpy(zero_copy_only=False)
+    elif isinstance(values, pd.Series | pd.Index | pd.api.extensions.ExtensionArray):
+        return values.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.asarray(values, dtype=np.float64).ravel()
@@ -1,6 +1,13 @@
+from collections.abc import Callable, Hashable
 from itertools import chain
+from operator import methodcaller
 
+import numpy as np
 import pandas as pd
+from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Tick
+
+from nsds._compat import copy_on_write
 
 
 class Percentiles:
@@ -24,21 +31,218 @@ def dt_group(key: str, freq: str) -> pd.Grouper:
     return pd.Grouper(key=key, freq=freq)
 
 
+def dt_aggregate(df: pd.DataFrame,
+                 key: str,
+                 freq: str,
+                 agg: str | Callable | list | dict = "sum",
+                 by: Hashable | list[Hashable] | None = None) -> pd.DataFrame | pd.Series:
+    """
+    `df.groupby([dt_group(key, freq), *by]).agg(agg)` for fixed frequencies
+    ("15min", "h", "D", ...), with the same result, but much faster on large
+    frames: each timestamp's bucket is found by integer arithmetic on its
+    underlying int64, and the groups come straight from those bucket numbers
+    instead of the resample binning machinery.
+
+    Like `pd.Grouper`, buckets start at midnight of the first day and empty
+    ones are kept when grouping by time alone. On a tz-aware column, days
+    ("D", "2D") follow the local calendar and shorter buckets are fixed
+    spans of absolute time.
+    """
+    by = _as_list(by)
+    timestamps = df[key]
+    if not timestamps.notna().any():
+        return df.groupby([dt_group(key, freq), *by]).agg(agg)
+
+    buckets = pd.Series(_time_buckets(timestamps, freq), index=df.index, name=key, copy=False)
+    value_columns = [col for col in df.columns if col != key and col not in by]
+    result = df.groupby([buckets, *by], observed=bool(by))[value_columns].agg(agg)
+
+    # The bucket level holds categories of timestamps - turn it back into them
+    if isinstance(result.index, pd.MultiIndex):
+        level = result.index.levels[0]
+        result.index = result.index.set_levels(level.astype(level.categories.dtype), level=0)
+    else:
+        # `pd.Grouper` sets the frequency too, except when there are NaT
+        result.index = pd.DatetimeIndex(
+            result.index.astype(result.index.categories.dtype),
+            freq=None if timestamps.hasnans else freq,
+        )
+    return result
+
+
+def _time_buckets(timestamps: pd.Series, freq: str) -> pd.Categorical:
+    offset = to_offset(freq)
+    # Days follow the local calendar, as `pd.Grouper` bins them (pandas 3 made
+    # "D" a calendar offset, and older versions special-case it in resample)
+    calendar_days = isinstance(offset, pd.offsets.Day)
+    if not (isinstance(offset, Tick) or calendar_days):
+        raise ValueError(
+            f"`freq` must be a fixed frequency such as '15min', 'h' or 'D', got '{freq}'. "
+            "Use `dt_group` for calendar ones."
+        )
+
+    # Integer positions on the clock the buckets are fixed on: local wall
+    # time for calendar days, UTC otherwise
+    tz, unit = timestamps.dt.tz, timestamps.dt.unit
+    origin = timestamps.min().normalize()
+    if tz is not None:
+        to_naive = methodcaller("tz_localize" if calendar_days else "tz_convert", None)
+        timestamps, origin = to_naive(timestamps.dt), to_naive(origin)
+
+    span = pd.Timedelta(days=offset.n) if calendar_days else pd.Timedelta(offset)
+    step, remainder = divmod(span.value, pd.Timedelta(1, unit=unit).value)
+    if remainder or not step:
+        raise ValueError(f"`freq` '{freq}' is finer than the '{unit}' resolution of the column")
+
+    # Bins are aligned to the origin, but the first is the one with the minimum
+    start = origin.as_unit(unit).asm8.view(np.int64)
+    start += (timestamps.min().as_unit(unit).asm8.view(np.int64) - start) // step * step
+    codes = (timestamps.to_numpy().view(np.int64) - start) // step
+    codes[timestamps.isna().to_numpy()] = -1
+
+    categories = pd.DatetimeIndex((start + np.arange(codes.max() + 1) * step).view(f"M8[{unit}]"))
+    if tz is not None:
+        categories = (
+            categories.tz_localize(tz, ambiguous=True, nonexistent="shift_forward")
+            if calendar_days
+            else categories.tz_localize("UTC").tz_convert(tz)
+        )
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
 def merge_insert_at(df_l: pd.DataFrame,
                     df_r: pd.DataFrame,
                     insert_index: int,
                     **kwargs) -> pd.DataFrame:
+    """
+    `pd.merge(df_l, df_r, **kwargs)` with the columns `df_r` adds placed at
+    `insert_index` among those of `df_l`.
+
+    Without copy-on-write (pandas < 3 by default), the join only runs on the
+    keys and every output column is taken once from its source into the
+    result, so the merged frame is never built and then copied again to
+    reorder it. With `left_index=True` and `right_index=True` the positions
+    come straight from `Index.join`, which has a fast path for sorted unique
+    indexes.
 
+    The only columns `df_r` may share with `df_l` are keys both sides merge on.
+    """
     # Convert negative index to positive
     if insert_index < 0:
         insert_index = df_l.shape[1] + 1 + insert_index
 
     # Preserve column order from df_r
-    columns_to_add = (col for col in df_r.columns if col not in df_l.columns)
+    columns_to_add = [col for col in df_r.columns if col not in df_l.columns]
 
-    columns = chain(
+    columns = list(chain(
         df_l.columns[:insert_index],
         columns_to_add,
         df_l.columns[insert_index:],
+    ))
+
+    keys_l, keys_r = _merge_keys(df_l, df_r, kwargs)
+    shared = [
+        col for col in df_r.columns
+        if col in df_l.columns and not (col in keys_l and col in keys_r)
+    ]
+    if shared:
+        raise ValueError(f"Columns {shared} are in both frames but are not common merge keys")
+
+    # Under copy-on-write the selection is lazy, so the merged frame is not
+    # copied again. Keys that are index levels or arrays are left to pandas.
+    if copy_on_write() or not (_are_columns(keys_l, df_l) and _are_columns(keys_r, df_r)):
+        return pd.merge(df_l, df_r, **kwargs)[columns]
+
+    on_indexes = kwargs.get("left_index") and kwargs.get("right_index")
+    if on_indexes and set(kwargs) <= {"left_index", "right_index", "how", "sort"}:
+        index, positions_l, positions_r = df_l.index.join(
+            df_r.index,
+            how=kwargs.get("how", "inner"),
+            return_indexers=True,
+            sort=kwargs.get("sort", False),
+        )
+        merged_keys = pd.DataFrame(index=index)
+    else:
+        merged_keys, positions_l, positions_r = _merge_positions(
+            df_l[keys_l], df_r[keys_r], kwargs
+        )
+
+    arrays = {}
+    for i, col in enumerate(columns):
+        if col in merged_keys.columns:
+            arrays[i] = merged_keys[col].array
+        elif col in df_l.columns:
+            arrays[i] = _take(df_l[col], positions_l)
+        else:
+            arrays[i] = _take(df_r[col], positions_r)
+
+    result = pd.DataFrame(arrays, index=merged_keys.index, copy=False)
+    result.columns = pd.Index(columns)
+    return result
+
+
+def _merge_keys(df_l: pd.DataFrame,
+                df_r: pd.DataFrame,
+                kwargs: dict) -> tuple[list[Hashable], list[Hashable]]:
+    """ The key columns `pd.merge` would use on each side, none for an index """
+    if "on" in kwargs:
+        on = _as_list(kwargs["on"])
+        return on, on
+    keys_l = _as_list(kwargs.get("left_on"))
+    keys_r = _as_list(kwargs.get("right_on"))
+    if keys_l or keys_r or kwargs.get("left_index") or kwargs.get("right_index"):
+        return keys_l, keys_r
+    common = [col for col in df_l.columns if col in df_r.columns]
+    return common, common
+
+
+def _as_list(keys: Hashable | list | None) -> list:
+    if keys is None:
+        return []
+    return list(keys) if isinstance(keys, list | tuple) else [keys]
+
+
+def _are_columns(keys: list, df: pd.DataFrame) -> bool:
+    return all(isinstance(key, Hashable) and key in df.columns for key in keys)
+
+
+def _merge_positions(keys_l: pd.DataFrame,
+                     keys_r: pd.DataFrame,
+                     kwargs: dict) -> tuple[pd.DataFrame, np.ndarray | None, np.ndarray | None]:
+    # A merge of the keys alone, carrying each side's row positions, so that
+    # pandas still decides key coalescing, the row order and the result index
+    position_l, position_r = _unused_name(keys_l, keys_r, "l"), _unused_name(keys_l, keys_r, "r")
+    merged = pd.merge(
+        keys_l.assign(**{position_l: np.arange(len(keys_l))}),
+        keys_r.assign(**{position_r: np.arange(len(keys_r))}),
+        **kwargs,
+    )
+    positions = [
+        merged.pop(name).fillna(-1).to_numpy(dtype=np.intp) for name in (position_l, position_r)
+    ]
+    # None, as from `Index.join`, where a side keeps all its rows in order
+    return merged, *(
+        None if _is_identity(side, len(keys)) else side
+        for side, keys in zip(positions, (keys_l, keys_r), strict=True)
     )
-    return pd.merge(df_l, df_r, **kwargs)[columns]
+
+
+def _is_identity(positions: np.ndarray, length: int) -> bool:
+    return len(positions) == length and bool((positions == np.arange(length)).all())
+
+
+def _unused_name(keys_l: pd.DataFrame, keys_r: pd.DataFrame, side: str) -> str:
+    name = f"_position_{side}"
+    while name in keys_l.columns or name in keys_r.columns:
+        name = f"_{name}"
+    return name
+
+
+def _take(column: pd.Series,
+          positions: np.ndarray | None) -> np.ndarray | pd.api.extensions.ExtensionArray:
+    # -1 marks a row missing on this side, filled with NA (and upcast) as
+    # `pd.merge` does. NumPy columns go as arrays, so ints can become floats.
+    values = column.to_numpy() if isinstance(column.dtype, np.dtype) else column.array
+    if positions is None:
+        return values.copy()
+    return pd.api.extensions.take(values, positions, allow_fill=True)
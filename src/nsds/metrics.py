@@ -1,27 +1,72 @@
+from collections.abc import Callable
+from functools import partial
+from typing import Literal, Self
+
 import numpy as np
-from numpy.typing import ArrayLike
+import pandas as pd
+from numpy.typing import ArrayLike, DTypeLike
+
+from nsds._parallel import ExecutorKind, ordered_map
+from nsds.utils.numeric import gini_inequality_coefficient
+
+type MultiOutput = Literal["raw_values", "uniform_average", "variance_weighted"]
+
+_MULTIOUTPUT = ("raw_values", "uniform_average", "variance_weighted")
 
 
 def r2_score(y_true: ArrayLike,
              y_pred: ArrayLike,
              *,
-             sample_weight: ArrayLike | None = None) -> np.float64:
-    """
-    Coefficient of determination, matching sklearn's single-output `r2_score`
-    (including its behaviour on a constant `y_true`) without the dependency.
+             sample_weight: ArrayLike | None = None,
+             multioutput: MultiOutput | ArrayLike = "uniform_average",
+             dtype: DTypeLike = np.float64) -> np.floating | np.ndarray:
     """
-    y_true = np.asarray(y_true, dtype=float)
-    y_pred = np.asarray(y_pred, dtype=float)
-    weight = 1.0 if sample_weight is None else np.asarray(sample_weight, dtype=float)
+    Coefficient of determination, matching sklearn's `r2_score` without the
+    dependency. A constant `y_true` scores 1 when predicted exactly and 0
+    otherwise, even where its mean does not round to the value itself.
 
-    mean = np.average(y_true, weights=sample_weight)
-    residual_sum_of_squares = np.sum(weight * (y_true - y_pred) ** 2)
-    total_sum_of_squares = np.sum(weight * (y_true - mean) ** 2)
+    2-D `(n_samples, n_outputs)` arrays are scored column by column in one
+    pass, and `multioutput` combines the scores as in sklearn: `raw_values`
+    returns them all, `uniform_average` their mean, `variance_weighted` their
+    average weighted by each column's total sum of squares, and an array
+    weights them explicitly. The data is held in `dtype`, so `np.float32`
+    arrays are not copied to float64; the sums still accumulate in float64.
+    """
+    y_true = np.asarray(y_true, dtype=dtype)
+    y_pred = np.asarray(y_pred, dtype=dtype)
+    if y_true.ndim == 1:
+        y_true, y_pred = y_true[:, None], y_pred[:, None]
+    weight = None if sample_weight is None else np.asarray(sample_weight, dtype=dtype)
 
-    if total_sum_of_squares == 0:
-        return np.float64(1.0 if residual_sum_of_squares == 0 else 0.0)
+    weight_sum = len(y_true) if weight is None else weight.sum(dtype=np.float64)
+    mean = (_column_sums(y_true, weight=weight) / weight_sum).astype(y_true.dtype)
+    # One temporary array, reused for the residuals and then the deviations
+    deviations = np.subtract(y_true, y_pred)
+    residual_sum_of_squares = _column_sums(deviations, deviations, weight=weight)
+    np.subtract(y_true, mean, out=deviations)
+    total_sum_of_squares = _column_sums(deviations, deviations, weight=weight)
+    # A constant column has no variance, however its mean happens to round
+    total_sum_of_squares[y_true.min(axis=0) == y_true.max(axis=0)] = 0
+    scores = _r2_from_sums(total_sum_of_squares, residual_sum_of_squares).astype(y_true.dtype)
 
-    return np.float64(1 - residual_sum_of_squares / total_sum_of_squares)
+    if isinstance(multioutput, str):
+        if multioutput not in _MULTIOUTPUT:
+            raise ValueError(
+                f"`multioutput` must be one of {', '.join(_MULTIOUTPUT)} or an array, "
+                f"got '{multioutput}'"
+            )
+        if multioutput == "raw_values":
+            return scores
+        # With every column constant there is no variance to weigh by, and
+        # sklearn falls back to the uniform average
+        output_weights = (
+            total_sum_of_squares
+            if multioutput == "variance_weighted" and total_sum_of_squares.any()
+            else None
+        )
+    else:
+        output_weights = multioutput
+    return np.average(scores, weights=output_weights)
 
 
 def r2_adjusted(y_true: ArrayLike,
@@ -49,8 +94,355 @@ def smape(y_true: ArrayLike,
     """
     y_true = np.asarray(y_true, dtype=float)
     y_pred = np.asarray(y_pred, dtype=float)
+    return np.average(_symmetric_errors(y_true, y_pred), weights=sample_weight)
+
+
+def grouped_metrics(y_true: ArrayLike,
+                    y_pred: ArrayLike,
+                    groups: ArrayLike | pd.Series | pd.DataFrame,
+                    *,
+                    n_features: int | None = None,
+                    sample_weight: ArrayLike | None = None) -> pd.DataFrame:
+    """
+    `r2_score`, `smape` and, given `n_features`, `r2_adjusted` of every group
+    at once, as a tidy DataFrame: the group keys, the row count `n` and one
+    column per metric, sorted by the keys. Pass several keys as a DataFrame.
+
+    Every sum is taken per group in one `np.bincount` pass, so the results
+    match the scalar functions up to floating-point rounding. Rows with a
+    missing key are left out, as in `groupby`.
+    """
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    weight = (
+        np.ones_like(y_true) if sample_weight is None
+        else np.asarray(sample_weight, dtype=float)
+    )
+    if isinstance(groups, pd.DataFrame):
+        keys = groups
+    else:
+        keys = pd.Series(groups)
+        keys = keys.to_frame("group" if keys.name is None else keys.name)
+    grouped = keys.groupby(list(keys.columns), sort=True, observed=True)
+    codes = grouped.ngroup().to_numpy(dtype=float, na_value=-1).astype(np.intp)
+    if (codes < 0).any():
+        kept = codes >= 0
+        y_true, y_pred, weight, codes = y_true[kept], y_pred[kept], weight[kept], codes[kept]
+
+    sums = _grouped_sums(y_true, y_pred, weight, codes, grouped.ngroups)
+    result = grouped.size().rename("n").reset_index()
+    result["r2"] = _r2_from_sums(sums["total"], sums["residual"])
+    if n_features is not None:
+        n = result["n"].to_numpy()
+        result["r2_adjusted"] = 1 - (1 - result["r2"]) * (n - 1) / (n - n_features - 1)
+    result["smape"] = sums["symmetric_error"] / sums["weight"]
+    return result
+
+
+class R2Accumulator:
+    """
+    `r2_score` over data fed in chunks with `update`, e.g. from `iter_csvs`.
+    Accumulators built elsewhere, e.g. in other processes, combine with
+    `merge`. Only a handful of sums are kept, whatever the number of rows.
+
+    The weighted mean and the squares around it are combined chunk by chunk
+    with Chan's parallel update, which stays as accurate as the two-pass sum
+    of `r2_score`, so `result()` matches it up to rounding. A constant
+    `y_true` scores 1 when predicted exactly and 0 otherwise.
+    """
+
+    def __init__(self):
+        self.weight_sum = 0.0
+        self.mean = 0.0
+        self.total_sum_of_squares = 0.0
+        self.residual_sum_of_squares = 0.0
+
+    def update(self,
+               y_true: ArrayLike,
+               y_pred: ArrayLike,
+               sample_weight: ArrayLike | None = None) -> Self:
+        y_true, y_pred, weight = _as_arrays(y_true, y_pred, sample_weight)
+        weight_sum = weight.sum()
+        if not weight_sum:
+            return self
+
+        if y_true.min() == y_true.max():
+            # Exactly, so that a constant `y_true` keeps a total of 0, as in `r2_score`
+            mean, total_sum_of_squares = y_true[0], 0.0
+        else:
+            mean = np.sum(weight * y_true) / weight_sum
+            total_sum_of_squares = np.sum(weight * (y_true - mean) ** 2)
+        residual_sum_of_squares = np.sum(weight * (y_true - y_pred) ** 2)
+        return self._combine(weight_sum, mean, total_sum_of_squares, residual_sum_of_squares)
+
+    def merge(self, other: Self) -> Self:
+        if not other.weight_sum:
+            return self
+        return self._combine(
+            other.weight_sum,
+            other.mean,
+            other.total_sum_of_squares,
+            other.residual_sum_of_squares,
+        )
+
+    def result(self) -> np.float64:
+        """ `r2_score` of everything seen so far, NaN while empty """
+        if not self.weight_sum:
+            return np.float64(np.nan)
+        return np.float64(
+            _r2_from_sums(self.total_sum_of_squares, self.residual_sum_of_squares)
+        )
+
+    def _combine(self,
+                 weight_sum: float,
+                 mean: float,
+                 total_sum_of_squares: float,
+                 residual_sum_of_squares: float) -> Self:
+        combined_weight = self.weight_sum + weight_sum
+        delta = mean - self.mean
+        self.total_sum_of_squares += (
+            total_sum_of_squares + delta ** 2 * self.weight_sum * weight_sum / combined_weight
+        )
+        self.mean += delta * weight_sum / combined_weight
+        self.weight_sum = float(combined_weight)
+        self.residual_sum_of_squares += residual_sum_of_squares
+        return self
+
+
+class SmapeAccumulator:
+    """
+    `smape` over data fed in chunks with `update`, combined across workers
+    with `merge`, like `R2Accumulator`.
+    """
+
+    def __init__(self):
+        self.weight_sum = 0.0
+        self.error_sum = 0.0
+
+    def update(self,
+               y_true: ArrayLike,
+               y_pred: ArrayLike,
+               sample_weight: ArrayLike | None = None) -> Self:
+        y_true, y_pred, weight = _as_arrays(y_true, y_pred, sample_weight)
+        self.weight_sum += float(weight.sum())
+        self.error_sum += float(np.sum(weight * _symmetric_errors(y_true, y_pred)))
+        return self
+
+    def merge(self, other: Self) -> Self:
+        self.weight_sum += other.weight_sum
+        self.error_sum += other.error_sum
+        return self
+
+    def result(self) -> np.float64:
+        """ `smape` of everything seen so far, NaN while empty """
+        if not self.weight_sum:
+            return np.float64(np.nan)
+        return np.float64(self.error_sum / self.weight_sum)
+
+
+def bootstrap_ci(metric: Callable[..., np.float64],
+                 *arrays: ArrayLike,
+                 sample_weight: ArrayLike | None = None,
+                 n_resamples: int = 1_000,
+                 confidence: float = 0.95,
+                 max_memory_mb: float = 256,
+                 seed: int | None = 0,
+                 n_jobs: int | None = 1,
+                 executor: ExecutorKind = "process") -> pd.Series:
+    """
+    Percentile bootstrap confidence interval of `r2_score`, `smape` or
+    `gini_inequality_coefficient`, given the 1-D arrays the metric takes, e.g.
+    `bootstrap_ci(r2_score, y_true, y_pred)`. Returns the metric on all the
+    data as `estimate`, with the interval as `low` and `high`.
+
+    A resample is drawn as how many times each row is picked, so a whole
+    block of resamples is scored at once: matrix products for the sums of
+    `r2_score` and `smape`, and one sort of the data for every Gini. Blocks
+    are sized to keep their arrays within `max_memory_mb`.
+
+    Every block has its own random stream spawned from `seed`, so running the
+    blocks on a pool with `n_jobs` other than 1 (`None` uses every core) does
+    not change the result.
+    """
+    if metric not in _BOOTSTRAP_KERNELS:
+        names = ", ".join(func.__name__ for func in _BOOTSTRAP_KERNELS)
+        raise ValueError(f"`metric` must be one of {names}, got {metric!r}")
+    if n_resamples < 1:
+        raise ValueError(f"`n_resamples` must be positive, got {n_resamples}")
+    if not 0 < confidence < 1:
+        raise ValueError(f"`confidence` must be between 0 and 1, got {confidence}")
+    prepare, kernel = _BOOTSTRAP_KERNELS[metric]
+
+    data = prepare(*arrays, sample_weight=sample_weight)
+    n = len(data[0])
+    block_size = int(max_memory_mb * 1024 ** 2 // (_BOOTSTRAP_BLOCK_ARRAYS * n * 8)) or 1
+    sizes = [min(block_size, n_resamples - start) for start in range(0, n_resamples, block_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    scores = np.concatenate(list(ordered_map(
+        partial(_bootstrap_block, kernel, data),
+        zip(seeds, sizes, strict=True),
+        max_workers=n_jobs,
+        executor=executor,
+    )))
+
+    # Scored like the resamples, with every row drawn once
+    estimate = kernel(np.ones((1, n)), *data)[0]
+    low, high = np.quantile(scores, [(1 - confidence) / 2, (1 + confidence) / 2])
+    return pd.Series({"estimate": estimate, "low": low, "high": high})
+
+
+def _bootstrap_block(kernel: Callable[..., np.ndarray],
+                     data: tuple[np.ndarray, ...],
+                     block: tuple[np.random.SeedSequence, int]) -> np.ndarray:
+    # Module level, so that a process pool can pickle it
+    seed, size = block
+    n = len(data[0])
+    # One flat `bincount` counts the draws of every resample in the block,
+    # each offset into its own row
+    draws = np.random.default_rng(seed).integers(0, n, size=(size, n))
+    draws += np.arange(0, size * n, n)[:, None]
+    counts = np.bincount(draws.ravel(), minlength=size * n).reshape(size, n)
+    return kernel(counts.astype(float), *data)
+
+
+def _prepare_r2(y_true: ArrayLike,
+                y_pred: ArrayLike,
+                *,
+                sample_weight: ArrayLike | None) -> tuple[np.ndarray]:
+    y_true, y_pred, weight = _as_arrays(y_true, y_pred, sample_weight)
+    # Centred on the overall mean, so that the total sum of squares of a
+    # resample can be taken from its sums without losing precision
+    deviations = (
+        np.zeros_like(y_true) if y_true.min() == y_true.max()
+        else y_true - np.average(y_true, weights=weight)
+    )
+    return (np.column_stack([
+        weight,
+        weight * deviations,
+        weight * deviations ** 2,
+        weight * (y_true - y_pred) ** 2,
+    ]),)
+
+
+def _prepare_smape(y_true: ArrayLike,
+                   y_pred: ArrayLike,
+                   *,
+                   sample_weight: ArrayLike | None) -> tuple[np.ndarray]:
+    y_true, y_pred, weight = _as_arrays(y_true, y_pred, sample_weight)
+    return (np.column_stack([weight, weight * _symmetric_errors(y_true, y_pred)]),)
+
+
+def _prepare_gini(x: ArrayLike,
+                  *,
+                  sample_weight: ArrayLike | None) -> tuple[np.ndarray, np.ndarray]:
+    x = np.asarray(x, dtype=float)
+    order = np.argsort(x, kind="stable")
+    weight = np.ones_like(x) if sample_weight is None else np.asarray(sample_weight, dtype=float)
+    return x[order], weight[order]
+
+
+def _r2_kernel(counts: np.ndarray, columns: np.ndarray) -> np.ndarray:
+    sums = counts @ columns
+    with np.errstate(divide="ignore", invalid="ignore"):
+        total_sum_of_squares = sums[:, 2] - sums[:, 1] ** 2 / sums[:, 0]
+    return _r2_from_sums(total_sum_of_squares, sums[:, 3])
+
+
+def _smape_kernel(counts: np.ndarray, columns: np.ndarray) -> np.ndarray:
+    sums = counts @ columns
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return sums[:, 1] / sums[:, 0]
+
+
+def _gini_kernel(counts: np.ndarray, x: np.ndarray, weight: np.ndarray) -> np.ndarray:
+    # The weighted formula of `gini_inequality_coefficient` over the sorted
+    # data, rows with a count of 0 dropping out. Summed by parts it becomes
+    # sum(w * x * (2 * cumsum(w) - w - sum(w))) / (sum(w * x) * sum(w)).
+    weights = np.multiply(counts, weight, out=counts)
+    ranks = np.cumsum(weights, axis=1)
+    weight_sums = ranks[:, -1].copy()
+    ranks *= 2
+    ranks -= weights
+    ranks -= weight_sums[:, None]
+    weights *= x
+    return np.einsum("ij,ij->i", weights, ranks) / (weights.sum(axis=1) * weight_sums)
+
+
+# Per metric: how to prepare its arrays and the kernel that scores a block of
+# resamples from their counts
+_BOOTSTRAP_KERNELS: dict[Callable, tuple[Callable, Callable]] = {
+    r2_score: (_prepare_r2, _r2_kernel),
+    smape: (_prepare_smape, _smape_kernel),
+    gini_inequality_coefficient: (_prepare_gini, _gini_kernel),
+}
+# At most this many (resamples x rows) arrays are alive at once while a block
+# is drawn and scored
+_BOOTSTRAP_BLOCK_ARRAYS = 3
+
+
+def _as_arrays(y_true: ArrayLike,
+               y_pred: ArrayLike,
+               sample_weight: ArrayLike | None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    y_true = np.atleast_1d(np.asarray(y_true, dtype=float))
+    y_pred = np.atleast_1d(np.asarray(y_pred, dtype=float))
+    if y_true.ndim > 1 or y_pred.ndim > 1:
+        # Flattening would pool the outputs into a single score
+        raise ValueError(
+            f"Only 1-D `y_true` and `y_pred` are supported here, got shapes "
+            f"{y_true.shape} and {y_pred.shape}"
+        )
+    weight = (
+        np.ones_like(y_true) if sample_weight is None
+        else np.broadcast_to(np.asarray(sample_weight, dtype=float), y_true.shape)
+    )
+    return y_true, y_pred, weight
+
+
+def _grouped_sums(y_true: np.ndarray,
+                  y_pred: np.ndarray,
+                  weight: np.ndarray,
+                  codes: np.ndarray,
+                  n_groups: int) -> dict[str, np.ndarray]:
+    def total(values: np.ndarray) -> np.ndarray:
+        return np.bincount(codes, weights=values, minlength=n_groups)
+
+    weight_sum = total(weight)
+    # Two passes, like `r2_score`: the mean first, then squares around it
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = total(weight * y_true) / weight_sum
+    # A group is constant when every value equals its first one
+    first = np.empty(n_groups)
+    first[codes[::-1]] = y_true[::-1]
+    varies = total(y_true != first[codes]) > 0
+    return {
+        "weight": weight_sum,
+        "total": np.where(varies, total(weight * (y_true - mean[codes]) ** 2), 0.0),
+        "residual": total(weight * (y_true - y_pred) ** 2),
+        "symmetric_error": total(weight * _symmetric_errors(y_true, y_pred)),
+    }
+
+
+def _column_sums(*factors: np.ndarray, weight: np.ndarray | None) -> np.ndarray:
+    # Column sums of the elementwise product, weighted by row. Accumulated in
+    # float64 whatever the dtype, without a float64 copy of the factors.
+    subscripts = ",".join(["ij"] * len(factors))
+    if weight is not None:
+        factors, subscripts = (*factors, weight), f"{subscripts},i"
+    return np.einsum(f"{subscripts}->j", *factors, dtype=np.float64)
+
+
+def _r2_from_sums(total_sum_of_squares: np.ndarray,
+                  residual_sum_of_squares: np.ndarray) -> np.ndarray:
+    # A constant `y_true` scores 1 when predicted exactly and 0 otherwise
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(
+            total_sum_of_squares == 0,
+            (residual_sum_of_squares == 0).astype(float),
+            1 - residual_sum_of_squares / total_sum_of_squares,
+        )
+
 
+def _symmetric_errors(y_true: np.ndarray, y_pred: np.ndarray) -> np.ndarray:
     with np.errstate(divide='ignore', invalid='ignore'):
         symmetric_errors = 2 * np.abs(y_pred - y_true) / (np.abs(y_true) + np.abs(y_pred))
-    symmetric_errors = np.nan_to_num(symmetric_errors, nan=0.0)
-    return np.average(symmetric_errors, weights=sample_weight)
+    return np.nan_to_num(symmetric_errors, nan=0.0)
@@ -1,18 +1,32 @@
-from collections.abc import Callable
+import io
+from collections.abc import Callable, Iterator
+from decimal import Decimal
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import pytest
+from pyarrow import compute as pc
+from pyarrow import parquet as pq
 
 from nsds.frame import (
+    CsvCache,
+    IncrementalCsvReader,
     NDFrameExtensions,
+    QuantileSketch,
+    dt_aggregate,
     dt_group,
     extension_names,
     extensions,
+    infer_csv_schema,
+    iter_csvs,
     merge_insert_at,
     percentiles,
     read_csv_pyarrow,
     read_csvs,
+    scan_csvs,
     set_pandas_options,
 )
 
@@ -21,11 +35,14 @@ EXPECTED_EXTENSIONS = {
     "explode_all",
     "memory_mb",
     "missing",
+    "optimize_dtypes",
     "preview",
     "show",
     "sort",
     "sortd",
     "to_csv_",
+    "to_feather_",
+    "to_parquet_",
     "vc",
 }
 
@@ -84,6 +101,76 @@ class TestValueCounts:
         with pytest.raises(TypeError):
             NDFrameExtensions.vc(object())
 
+    @pytest.mark.parametrize("dropna", [False, True])
+    @pytest.mark.parametrize("columns", [["a"], ["a", "b"]])
+    def test_arrow_backed_frames_match_the_groupby(self,
+                                                   columns: list[str],
+                                                   dropna: bool,
+                                                   monkeypatch: pytest.MonkeyPatch):
+        df = pd.DataFrame({"a": ["x", "x", "y", None, "x", "y"], "b": [1, 1, 2, 3, 1, 2]})
+        arrow = df[columns].convert_dtypes(dtype_backend="pyarrow")
+
+        with patch.object(pd.DataFrame, "groupby", side_effect=AssertionError):
+            result = arrow.vc(dropna=dropna)
+        monkeypatch.setattr(extensions, "_all_arrow_backed", lambda df: False)
+        expected = arrow.vc(dropna=dropna)
+
+        pd.testing.assert_frame_equal(result, expected)
+
+    @pytest.mark.parametrize("dropna", [False, True])
+    def test_arrow_dictionary_columns_with_nulls(self, dropna: bool):
+        # What `read_parquet(dtype_backend="pyarrow")` gives for a categorical
+        labels = pa.array(["a", None, "a", "b", "a", None]).dictionary_encode()
+        df = pd.DataFrame({
+            "label": pd.arrays.ArrowExtensionArray(labels),
+            "n": pd.array([1, 2, 1, 3, 1, 2], dtype="int64[pyarrow]"),
+        })
+
+        result = df.vc(dropna=dropna).reset_index()
+
+        expected = [("a", 1, 3), ("-", 2, 2), ("b", 3, 1)]
+        if dropna:
+            expected.remove(("-", 2, 2))
+        rows = zip(result["label"].fillna("-"), result["n"], result["count"], strict=True)
+        assert list(rows) == expected
+
+    def test_top_k_keeps_percentages_of_the_whole(self, series: pd.Series):
+        result = series.vc(top_k=1)
+
+        assert result["count"].tolist() == [2]
+        assert result["percentage"].tolist() == [50.0]
+
+    @pytest.mark.parametrize("dropna", [False, True])
+    def test_approx_is_exact_while_the_summary_fits(self, dropna: bool):
+        df = pd.DataFrame({"a": ["x", "x", "y", None, "x", "y"], "b": [1, 1, 2, 3, 1, 2]})
+
+        exact = df.vc(top_k=2, dropna=dropna)
+        approx = df.vc(top_k=2, dropna=dropna, approx=True)
+
+        # Rows and values, since the exact index may keep an unused NaN level
+        pd.testing.assert_frame_equal(
+            approx.drop(columns="count_error").reset_index(), exact.reset_index()
+        )
+        assert approx["count_error"].eq(0).all()
+
+    def test_approx_bounds_the_error(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(extensions, "_SKETCH_CHUNK_ROWS", 7)
+        monkeypatch.setattr(extensions, "_SKETCH_SLOTS_PER_KEY", 2)
+        series = pd.Series(["a"] * 30 + ["b"] * 20 + list("cdefghijklmnop"), name="key")
+        true_counts = series.value_counts()
+
+        result = series.vc(top_k=2, approx=True)
+
+        assert result.index.tolist() == ["a", "b"]
+        error = result["count_error"].iloc[0]
+        assert 0 < error <= len(series) / (2 * 2 + 1)
+        for key, count in result["count"].items():
+            assert count <= true_counts[key] <= count + error
+
+    def test_approx_needs_top_k(self, series: pd.Series):
+        with pytest.raises(ValueError, match="needs `top_k`"):
+            series.vc(approx=True)
+
 
 class TestMissing:
 
@@ -99,6 +186,32 @@ class TestMissing:
         assert result.loc["label", "empty_str"] == 1
         assert pd.isna(result.loc["amount", "empty_str"])
 
+    def test_chunked_and_arrow_columns_give_the_same_report(self,
+                                                            df: pd.DataFrame,
+                                                            monkeypatch: pytest.MonkeyPatch):
+        expected = df.missing()
+        monkeypatch.setattr(extensions, "_MISSING_CHUNK_ROWS", 3)
+        arrow = df.convert_dtypes(dtype_backend="pyarrow")
+
+        for frame in (df, arrow):
+            pd.testing.assert_frame_equal(frame.missing(), expected)
+
+    def test_arrow_decimal_and_dictionary_columns(self):
+        df = pd.DataFrame({
+            "price": pd.array(
+                [Decimal("0.00"), None, Decimal("1.50")], dtype=pd.ArrowDtype(pa.decimal128(10, 2))
+            ),
+            "label": pd.arrays.ArrowExtensionArray(pa.array(["", None, "x"]).dictionary_encode()),
+        })
+
+        result = df.missing()
+
+        assert result["isna"].tolist() == [1, 1]
+        assert result.loc["price", "eq0"] == 1
+        assert pd.isna(result.loc["price", "empty_str"])
+        assert result.loc["label", "empty_str"] == 1
+        assert pd.isna(result.loc["label", "eq0"])
+
     def test_series_drops_inapplicable_columns(self, series: pd.Series):
         result = series.missing()
 
@@ -114,12 +227,52 @@ class TestSorting:
     def test_sortd_is_descending(self, df: pd.DataFrame):
         assert df.sortd("amount")["amount"].tolist() == [40, 30, 10, 0]
 
+    @pytest.mark.parametrize("by", ["a", ["a", "b"]])
+    @pytest.mark.parametrize("method", ["sort", "sortd"])
+    def test_n_matches_a_stable_sort_head(self, method: str, by: str | list[str]):
+        df = pd.DataFrame({"a": [3, 1, 3, 2, 1, 3, 2], "b": [0, 5, 1, 1, 2, 0, 0]})
+        ascending = method == "sort"
+
+        result = getattr(df, method)(by, n=4)
+
+        expected = df.sort_values(by, ascending=ascending, kind="stable").head(4)
+        pd.testing.assert_frame_equal(result, expected)
+
+    @pytest.mark.parametrize(
+        "series",
+        [
+            pd.Series([2.0, None, 1.0]),
+            pd.Series(["b", "c", "a"]),
+        ],
+        ids=["missing-values", "strings"],
+    )
+    def test_n_falls_back_to_the_full_sort(self, series: pd.Series):
+        expected = series.sort_values(ascending=False).head(3)
+
+        pd.testing.assert_series_equal(series.sortd(n=3), expected)
+
+    def test_n_passes_other_options_through(self, df: pd.DataFrame):
+        result = df.sort("amount", n=2, ascending=[False], ignore_index=True)
+
+        assert result["amount"].tolist() == [40, 30]
+        assert result.index.tolist() == [0, 1]
+
     @pytest.mark.parametrize("ascending", [True, False])
     def test_sortd_rejects_ascending(self, df: pd.DataFrame, ascending: bool):
         with pytest.raises(ValueError, match="always descending"):
             df.sortd("amount", ascending=ascending)
 
 
+def _row_total(amount, quantity):
+    # Module level, so that a process pool can pickle it
+    return amount * quantity
+
+
+def _total_batch(amount, quantity):
+    assert len(amount) <= 2
+    return amount * quantity
+
+
 class TestApplyRowWise:
 
     @staticmethod
@@ -148,6 +301,53 @@ class TestApplyRowWise:
         assert result == [10, 0, 90, 160]
         tqdm.assert_called_once()
 
+    @pytest.mark.parametrize("executor", ["thread", "process"])
+    def test_pool_keeps_the_row_order(self, df: pd.DataFrame, executor: str):
+        result = df.apply_row_wise(_row_total, n_jobs=2, executor=executor, chunksize=1)
+
+        assert isinstance(result, Iterator)
+        assert list(result) == [10, 0, 90, 160]
+
+    def test_show_progress_with_a_pool_counts_the_results(self,
+                                                          df: pd.DataFrame,
+                                                          fake_require: Callable):
+        tqdm = MagicMock(side_effect=lambda results, total: results)
+        stub = MagicMock(tqdm=tqdm)
+
+        with patch("nsds.frame.extensions.require", fake_require({"tqdm.auto": stub})):
+            result = list(df.apply_row_wise(
+                _row_total, show_progress=True, n_jobs=2, executor="thread"
+            ))
+
+        assert result == [10, 0, 90, 160]
+        tqdm.assert_called_once()
+        assert tqdm.call_args.kwargs == {"total": 4}
+
+    def test_vectorized_passes_whole_columns(self, df: pd.DataFrame):
+        calls = []
+
+        def total(amount, label):
+            calls.append((amount, label))
+            return amount * 2
+
+        df = df.astype({"label": pd.ArrowDtype(pa.string())})
+        result = list(df.apply_row_wise(total, vectorized=True))
+
+        assert result == [20, 0, 60, 80]
+        [(amount, label)] = calls
+        assert isinstance(amount, np.ndarray)
+        assert isinstance(label, pa.Array | pa.ChunkedArray)
+
+    @pytest.mark.parametrize("n_jobs", [1, 2])
+    def test_vectorized_batches_keep_the_row_order(self, df: pd.DataFrame, n_jobs: int):
+        result = df.apply_row_wise(_total_batch, vectorized=True, batch_size=2, n_jobs=n_jobs)
+
+        assert list(result) == [10, 0, 90, 160]
+
+    def test_batch_size_needs_vectorized(self, df: pd.DataFrame):
+        with pytest.raises(ValueError, match="`batch_size` only applies"):
+            df.apply_row_wise(self._total, batch_size=2)
+
 
 class TestDisplayHelpers:
 
@@ -189,6 +389,33 @@ class TestExplodeAll:
     def test_series_explodes_itself(self):
         assert pd.Series([[1, 2]]).explode_all().tolist() == [1, 2]
 
+    @pytest.mark.parametrize("ignore_index", [False, True])
+    def test_arrow_lists_explode_like_pandas(self, ignore_index: bool):
+        # Spelled out, since pandas 2 leaves large_list columns unexploded
+        df = pd.DataFrame({
+            "a": pd.array([[1, 2], [], None, [3]], dtype=pd.ArrowDtype(pa.list_(pa.int64()))),
+            "b": pd.array(
+                [["x", "y"], None, [], ["z"]], dtype=pd.ArrowDtype(pa.large_list(pa.string()))
+            ),
+        }, index=[10, 11, 12, 13])
+
+        result = df.explode_all(ignore_index=ignore_index)
+
+        expected = pd.DataFrame({
+            "a": pd.array([1, 2, None, None, 3], dtype=pd.ArrowDtype(pa.int64())),
+            "b": pd.array(["x", "y", None, None, "z"], dtype=pd.ArrowDtype(pa.string())),
+        }, index=range(5) if ignore_index else [10, 10, 11, 12, 13])
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_mismatched_arrow_lists_are_rejected_like_pandas(self):
+        df = pd.DataFrame({
+            "a": pd.Series([[1, 2]], dtype=pd.ArrowDtype(pa.list_(pa.int64()))),
+            "b": pd.Series([[3]], dtype=pd.ArrowDtype(pa.list_(pa.int64()))),
+        })
+
+        with pytest.raises(ValueError, match="matching element counts"):
+            df.explode_all()
+
 
 class TestMemoryMb:
 
@@ -201,6 +428,118 @@ class TestMemoryMb:
     def test_series_reports_a_single_value(self, series: pd.Series):
         assert series.memory_mb() > 0
 
+    @pytest.fixture
+    def strings(self) -> pd.DataFrame:
+        rng = np.random.default_rng(0)
+        words = ["x" * length for length in rng.integers(1, 200, 5_000)]
+        return pd.DataFrame({"word": pd.Series(words, dtype=object), "n": range(5_000)})
+
+    def test_estimate_brackets_the_exact_value(self, strings: pd.DataFrame):
+        exact = strings.memory_mb()
+
+        result = strings.memory_mb(mode="estimate", sample_rows=500)
+
+        assert result.columns.tolist() == ["mb", "low", "high"]
+        assert result.index.tolist() == ["Index", "word", "n"]
+        assert result.loc["word", "low"] <= exact["word"] <= result.loc["word", "high"]
+        assert result.loc["n", "mb"] == exact["n"]
+        assert result.loc["n", "low"] == result.loc["n", "high"]
+
+    def test_estimate_is_exact_below_the_sample_size(self, strings: pd.DataFrame):
+        series = strings["word"]
+
+        result = series.memory_mb(mode="estimate")
+
+        assert result["mb"] == pytest.approx(series.memory_mb())
+        assert result["low"] == result["high"] == result["mb"]
+
+    def test_rejects_unknown_modes(self, series: pd.Series):
+        with pytest.raises(ValueError, match="`mode` must be"):
+            series.memory_mb(mode="fast")
+
+
+class TestOptimizeDtypes:
+
+    def test_downcasts_integers_to_the_smallest_fitting_type(self):
+        df = pd.DataFrame({
+            "small": [1, 2, 3],
+            "wide": [1, 2, 2 ** 40],
+            "nullable": pd.array([1, None, 300], dtype="Int64"),
+            "arrow": pd.array([1, None, -3], dtype="int64[pyarrow]"),
+        })
+
+        result = df.optimize_dtypes()
+
+        assert result.dtypes.astype(str).tolist() == ["int8", "int64", "Int16", "int8[pyarrow]"]
+        pd.testing.assert_frame_equal(result.astype(df.dtypes), df)
+
+    def test_unsigned_integers_stay_unsigned_and_never_widen(self):
+        df = pd.DataFrame({
+            "byte": np.array([0, 255], dtype="uint8"),
+            "short": np.array([0, 60_000], dtype="uint16"),
+            "word": np.array([0, 200], dtype="uint32"),
+            "nullable": pd.array([0, None], dtype="UInt64"),
+        })
+
+        result = df.optimize_dtypes()
+
+        assert result.dtypes.astype(str).tolist() == ["uint8", "uint16", "uint8", "UInt8"]
+
+    def test_floats_only_shrink_within_the_tolerance(self):
+        df = pd.DataFrame({"exact": [0.5, 1.25, np.nan], "lossy": [0.1, 0.2, 0.3]})
+
+        assert df.optimize_dtypes().dtypes.astype(str).tolist() == ["float32", "float64"]
+        assert df.optimize_dtypes(float_tolerance=1e-6)["lossy"].dtype == np.float32
+
+    def test_repetitive_text_becomes_categorical(self):
+        df = pd.DataFrame({
+            "repeated": pd.Series(["a", "a", "a", "b"], dtype=object),
+            "unique": pd.Series(["a", "b", "c", "d"], dtype=object),
+            "mixed": pd.Series([1, "a", None, 2.5], dtype=object),
+        })
+
+        result = df.optimize_dtypes()
+
+        assert isinstance(result["repeated"].dtype, pd.CategoricalDtype)
+        assert result["unique"].dtype == pd.ArrowDtype(pa.string())
+        assert result["mixed"].dtype == object
+        assert result["unique"].tolist() == df["unique"].tolist()
+
+    def test_booleans_become_arrow_bool(self):
+        df = pd.DataFrame({
+            "plain": [True, False, True],
+            "boxed": pd.Series([True, None, False], dtype=object),
+        })
+
+        result = df.optimize_dtypes()
+
+        assert (result.dtypes == pd.ArrowDtype(pa.bool_())).all()
+        assert result["boxed"].isna().tolist() == [False, True, False]
+
+    def test_series_keeps_its_type(self, series: pd.Series):
+        result = series.optimize_dtypes()
+
+        assert isinstance(result, pd.Series)
+        assert result.name == series.name
+
+    def test_report_compares_dtypes_and_memory(self):
+        df = pd.DataFrame({"a": np.arange(1000), "b": ["x", "y"] * 500})
+
+        result, report = df.optimize_dtypes(report=True)
+
+        assert report.loc["a", "dtype_before"] == "int64"
+        assert report.loc["a", "dtype_after"] == "int16"
+        assert report.loc["a", "mb_after"] < report.loc["a", "mb_before"]
+        assert report["mb_after"].sum() < report["mb_before"].sum()
+
+    def test_report_follows_the_columns(self):
+        df = pd.DataFrame({"z": [1, 2], "Index": [1.5, 2.5], "a": ["x", "y"]})
+
+        _, report = df.optimize_dtypes(report=True)
+
+        assert report.index.tolist() == ["z", "Index", "a"]
+        assert report.notna().all().all()
+
 
 class TestToCsv:
 
@@ -246,6 +585,94 @@ class TestToCsv:
         with pytest.raises(KeyError, match="No datetime column 'missing'"):
             df_dated.to_csv_("out.csv", add_date_to_filename="missing")
 
+    def test_pyarrow_engine_matches_pandas(self, df: pd.DataFrame, tmp_path):
+        df.to_csv_(tmp_path / "pandas.csv")
+        df.to_csv_(tmp_path / "pyarrow.csv", engine="pyarrow")
+
+        content = (tmp_path / "pyarrow.csv").read_bytes()
+        assert content.startswith(b"\xef\xbb\xbf")
+        pd.testing.assert_frame_equal(
+            pd.read_csv(tmp_path / "pyarrow.csv", encoding="utf_8_sig"),
+            pd.read_csv(tmp_path / "pandas.csv", encoding="utf_8_sig"),
+        )
+
+    @pytest.mark.parametrize("filename", ["out.csv.gz", "out.csv.zst"])
+    def test_pyarrow_engine_compresses_by_suffix(self,
+                                                 df_dated: pd.DataFrame,
+                                                 filename: str,
+                                                 tmp_path,
+                                                 monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.chdir(tmp_path)
+
+        df_dated.to_csv_(filename, add_date_to_filename="day", engine="pyarrow")
+
+        stamped = filename.replace(".", "_20240304_050607.", 1)
+        codec = pa.Codec.detect(stamped).name
+        with pa.input_stream(tmp_path / stamped, compression=codec) as stream:
+            assert stream.read().startswith(b"\xef\xbb\xbf")
+
+    def test_pyarrow_engine_leaves_a_buffer_open(self, df: pd.DataFrame, tmp_path):
+        buffer = io.BytesIO()
+
+        df.to_csv_(buffer, engine="pyarrow")
+        df.to_csv_(tmp_path / "out.csv", engine="pyarrow")
+
+        assert not buffer.closed
+        assert buffer.getvalue() == (tmp_path / "out.csv").read_bytes()
+
+    def test_pyarrow_engine_writes_the_index_first(self, tmp_path):
+        df = pd.DataFrame({"a": [1, 2]}, index=pd.Index([5, 6], name="key"))
+
+        df.to_csv_(tmp_path / "out.csv", engine="pyarrow", index=True)
+
+        result = pd.read_csv(tmp_path / "out.csv", encoding="utf_8_sig")
+        assert result.columns.tolist() == ["key", "a"]
+        assert result["key"].tolist() == [5, 6]
+
+    def test_pyarrow_engine_rejects_what_it_cannot_write(self, df: pd.DataFrame, tmp_path):
+        with pytest.raises(ValueError, match="only writes UTF-8"):
+            df.to_csv_(tmp_path / "out.csv", engine="pyarrow", encoding="cp1252")
+        with pytest.raises(TypeError, match="float_format"):
+            df.to_csv_(tmp_path / "out.csv", engine="pyarrow", float_format="%.2f")
+
+
+class TestColumnarWriters:
+
+    @pytest.mark.parametrize("method, read", [
+        ("to_parquet_", pd.read_parquet),
+        ("to_feather_", pd.read_feather),
+    ])
+    def test_round_trips_dtypes_and_stamps_the_name(self,
+                                                    df_dated: pd.DataFrame,
+                                                    method: str,
+                                                    read: Callable,
+                                                    tmp_path,
+                                                    monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.chdir(tmp_path)
+        df = df_dated.set_index(df_dated.index + 10)
+
+        getattr(df, method)("snapshot.bin", add_date_to_filename="day")
+
+        pd.testing.assert_frame_equal(read(tmp_path / "snapshot_20240304_050607.bin"), df)
+
+    def test_parquet_row_groups_and_partitions(self, df: pd.DataFrame, tmp_path):
+        df.to_parquet_(tmp_path / "rows.parquet", row_group_size=3)
+        df.to_parquet_(tmp_path / "parts", partition_cols=["quantity"])
+
+        assert pq.ParquetFile(tmp_path / "rows.parquet").num_row_groups == 2
+        assert sorted(path.name for path in (tmp_path / "parts").iterdir()) == [
+            "quantity=1", "quantity=2", "quantity=3", "quantity=4",
+        ]
+
+    def test_feather_compression(self, df: pd.DataFrame, tmp_path):
+        df.to_feather_(tmp_path / "out.feather", compression="uncompressed")
+
+        pd.testing.assert_frame_equal(pd.read_feather(tmp_path / "out.feather"), df)
+
+    def test_unknown_column_is_rejected(self, df: pd.DataFrame, tmp_path):
+        with pytest.raises(KeyError, match="No datetime column 'missing'"):
+            df.to_parquet_(tmp_path / "out.parquet", add_date_to_filename="missing")
+
 
 class TestReaders:
 
@@ -261,6 +688,104 @@ class TestReaders:
         assert sorted(result["a"].tolist()) == [1, 2]
         assert set(result["_file"]) == {"one.csv", "two.csv"}
 
+    @pytest.mark.parametrize("executor", ["thread", "process"])
+    def test_read_csvs_in_parallel_keeps_the_glob_order(self,
+                                                        executor: str,
+                                                        tmp_path,
+                                                        monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.chdir(tmp_path)
+        for i in range(6):
+            pd.DataFrame({"a": [i, i]}).to_csv(f"{i}.csv", index=False)
+
+        result = read_csvs("*.csv", add_filename_column=True,
+                           max_workers=3, executor=executor)
+
+        assert result.equals(read_csvs("*.csv", add_filename_column=True))
+        assert result.index.tolist() == list(range(12))
+
+    def test_read_csvs_without_matches_raises(self, tmp_path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.chdir(tmp_path)
+
+        with pytest.raises(FileNotFoundError, match=r"No files match '\*\.csv'"):
+            read_csvs("*.csv")
+
+    def test_iter_csvs_yields_bounded_chunks_per_file(self,
+                                                      tmp_path,
+                                                      monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.chdir(tmp_path)
+        pd.DataFrame({"a": range(5)}).to_csv("one.csv", index=False)
+        pd.DataFrame({"a": range(3)}).to_csv("two.csv", index=False)
+
+        chunks = list(iter_csvs("*.csv", batch_rows=2, add_filename_column=True))
+
+        assert all(len(chunk) <= 2 for chunk in chunks)
+        assert all(isinstance(chunk["a"].dtype, pd.ArrowDtype) for chunk in chunks)
+        result = pd.concat(chunks, ignore_index=True)
+        expected = read_csvs("*.csv", add_filename_column=True)
+        assert result["a"].tolist() == expected["a"].tolist()
+        assert result["_file"].tolist() == expected["_file"].tolist()
+
+    def test_iter_csvs_can_yield_record_batches(self,
+                                                tmp_path,
+                                                monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.chdir(tmp_path)
+        pd.DataFrame({"a": range(3)}).to_csv("one.csv", index=False)
+
+        batches = list(iter_csvs("*.csv", add_filename_column=True, as_batches=True))
+
+        assert [batch.num_rows for batch in batches] == [3]
+        assert batches[0].schema.names == ["a", "_file"]
+
+    def test_scan_csvs_projects_and_filters(self, tmp_path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.chdir(tmp_path)
+        pd.DataFrame({"a": [1, 2], "b": [3, 4], "c": [5, 6]}).to_csv("one.csv", index=False)
+        pd.DataFrame({"a": [3, 4], "b": [7, 8], "c": [9, 0]}).to_csv("two.csv", index=False)
+
+        result = scan_csvs("*.csv", columns=["a"], filter=pc.field("c") > 5,
+                           add_filename_column=True)
+
+        assert result.columns.tolist() == ["a", "_file"]
+        assert sorted(result["a"].tolist()) == [2, 3]
+        assert set(result["_file"]) == {"one.csv", "two.csv"}
+        assert isinstance(result["a"].dtype, pd.ArrowDtype)
+
+    @pytest.fixture
+    def disagreeing_shards(self, tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "one.csv").write_text("id,score,note\n1,1,\n2,2,\n")
+        (tmp_path / "two.csv").write_text("id,score,note\nx,0.5,hello\n")
+
+    @pytest.mark.usefixtures("disagreeing_shards")
+    def test_infer_csv_schema_widens_disagreeing_types(self):
+        schema = infer_csv_schema("*.csv")
+
+        assert schema.field("id").type == pa.string()
+        assert schema.field("score").type == pa.float64()
+        assert schema.field("note").type == pa.string()
+
+    @pytest.mark.usefixtures("disagreeing_shards")
+    def test_readers_parse_every_shard_with_one_schema(self):
+        scanned = scan_csvs("*.csv")
+        streamed = pd.concat(iter_csvs("*.csv"), ignore_index=True)
+
+        for result in (scanned, streamed):
+            assert result.dtypes.tolist() == [
+                pd.ArrowDtype(pa.string()),
+                pd.ArrowDtype(pa.float64()),
+                pd.ArrowDtype(pa.string()),
+            ]
+            assert sorted(result["score"].tolist()) == [0.5, 1.0, 2.0]
+
+    def test_scan_csvs_without_matches_raises(self, tmp_path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.chdir(tmp_path)
+
+        with pytest.raises(FileNotFoundError, match="No files match"):
+            scan_csvs("*.csv")
+
+    def test_iter_csvs_rejects_empty_batches(self):
+        with pytest.raises(ValueError, match="`batch_rows` must be positive"):
+            iter_csvs("*.csv", batch_rows=0)
+
     def test_read_csv_pyarrow_uses_the_arrow_backend(self,
                                                     tmp_path,
                                                     monkeypatch: pytest.MonkeyPatch):
@@ -272,6 +797,190 @@ class TestReaders:
         assert isinstance(result["a"].dtype, pd.ArrowDtype)
 
 
+class TestCsvCache:
+
+    @pytest.fixture
+    def source(self, tmp_path) -> Path:
+        path = tmp_path / "data.csv"
+        pd.DataFrame({"a": [1, 2], "b": ["x", "y"]}).to_csv(path, index=False)
+        return path
+
+    def test_hit_skips_the_parse(self, source: Path, tmp_path):
+        cache = CsvCache(tmp_path / "cache")
+        first = cache.read_csv(source)
+
+        with patch("nsds.frame.cache.pd.read_csv") as read_csv:
+            second = cache.read_csv(source)
+
+        read_csv.assert_not_called()
+        assert second.equals(first)
+
+    def test_frames_arrow_cannot_hold_are_returned_uncached(self, tmp_path):
+        source = tmp_path / "mixed.csv"
+        source.write_text("a\n1\nx\n")
+        cache = CsvCache(tmp_path / "cache")
+        as_int = {"a": lambda value: int(value) if value.isdigit() else value}
+
+        result = cache.read_csv(source, converters=as_int)
+
+        assert result["a"].tolist() == [1, "x"]
+        assert not list((tmp_path / "cache").iterdir())
+
+    def test_keeps_arrow_dtypes(self, source: Path, tmp_path):
+        cache = CsvCache(tmp_path / "cache")
+        read_csv_pyarrow(source, cache=cache)
+
+        result = read_csv_pyarrow(source, cache=cache)
+
+        assert isinstance(result["a"].dtype, pd.ArrowDtype)
+
+    def test_changed_file_replaces_its_entry(self, source: Path, tmp_path):
+        cache = CsvCache(tmp_path / "cache")
+        cache.read_csv(source)
+        pd.DataFrame({"a": [3, 4, 5]}).to_csv(source, index=False)
+
+        result = cache.read_csv(source)
+
+        assert result["a"].tolist() == [3, 4, 5]
+        assert len(list(cache.directory.iterdir())) == 1
+
+    def test_arguments_are_part_of_the_key(self, source: Path, tmp_path):
+        cache = CsvCache(tmp_path / "cache")
+        cache.read_csv(source)
+
+        assert cache.read_csv(source, usecols=["a"]).columns.tolist() == ["a"]
+
+    def test_evicts_least_recently_used_entries(self, tmp_path):
+        cache = CsvCache(tmp_path / "cache", max_mb=0)
+        for name in ("one", "two"):
+            pd.DataFrame({"a": [1]}).to_csv(tmp_path / f"{name}.csv", index=False)
+            cache.read_csv(tmp_path / f"{name}.csv")
+
+        assert [entry.name.split("-")[0] for entry in cache.directory.iterdir()] == ["two"]
+
+        cache.clear()
+        assert cache.size_mb() == 0
+
+    def test_read_csvs_goes_through_the_cache(self,
+                                              tmp_path,
+                                              monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.chdir(tmp_path)
+        pd.DataFrame({"a": [1]}).to_csv("one.csv", index=False)
+        cache = CsvCache(tmp_path / "cache")
+
+        read_csvs("*.csv", cache=cache)
+
+        assert cache.size_mb() > 0
+
+
+class TestIncrementalCsvReader:
+
+    @pytest.fixture
+    def reader(self, tmp_path, monkeypatch: pytest.MonkeyPatch) -> IncrementalCsvReader:
+        monkeypatch.chdir(tmp_path)
+        pd.DataFrame({"a": [1, 2]}).to_csv("one.csv", index=False)
+        pd.DataFrame({"a": [3]}).to_csv("two.csv", index=False)
+        return IncrementalCsvReader("*.csv", add_filename_column=True)
+
+    def test_unchanged_folder_is_not_parsed_again(self, reader: IncrementalCsvReader):
+        first = reader.read()
+
+        with patch("nsds.frame.io.pd.read_csv") as read_csv:
+            second = reader.read()
+
+        read_csv.assert_not_called()
+        assert second is first
+
+    def test_only_new_files_are_parsed(self, reader: IncrementalCsvReader):
+        reader.read()
+        pd.DataFrame({"a": [4]}).to_csv("three.csv", index=False)
+
+        with patch("nsds.frame.io.pd.read_csv", wraps=pd.read_csv) as read_csv:
+            result = reader.read()
+
+        read_csv.assert_called_once_with(Path("three.csv"))
+        assert sorted(result["a"].tolist()) == [1, 2, 3, 4]
+        assert result["_file"].iloc[-1] == "three.csv"
+        assert result.index.tolist() == [0, 1, 2, 3]
+
+    def test_changed_and_removed_files_are_replaced(self, reader: IncrementalCsvReader):
+        reader.read()
+        pd.DataFrame({"a": [10, 20, 30]}).to_csv("one.csv", index=False)
+        Path("two.csv").unlink()
+
+        result = reader.read()
+
+        assert result["a"].tolist() == [10, 20, 30]
+        assert list(reader.manifest) == [Path("one.csv")]
+
+    def test_empty_folder_raises(self, reader: IncrementalCsvReader):
+        for filepath in Path().glob("*.csv"):
+            filepath.unlink()
+
+        with pytest.raises(FileNotFoundError, match="No files match"):
+            reader.read()
+
+
+class TestQuantileSketch:
+
+    @pytest.fixture
+    def values(self) -> np.ndarray:
+        rng = np.random.default_rng(0)
+        values = np.concatenate([
+            rng.lognormal(3, 2, 50_000), -rng.exponential(5, 10_000), np.zeros(100),
+        ])
+        rng.shuffle(values)
+        return values
+
+    @pytest.mark.parametrize(
+        "grid",
+        [percentiles.top_one, percentiles.bottom_ten, [0, 0.25, 0.5, 0.75, 1]],
+        ids=["top_one", "bottom_ten", "quartiles"],
+    )
+    def test_quantiles_are_within_the_relative_accuracy(self, values: np.ndarray, grid: list):
+        sketch = QuantileSketch(relative_accuracy=0.01).update(values)
+
+        result = sketch.quantile(grid)
+
+        exact = np.sort(values)[np.floor(np.asarray(grid) * (len(values) - 1)).astype(int)]
+        assert result.index.tolist() == grid
+        np.testing.assert_allclose(result.to_numpy(), exact, rtol=0.01)
+
+    def test_merged_sketches_equal_one_over_all_values(self, values: np.ndarray):
+        merged = QuantileSketch()
+        for part in np.array_split(values, 4):
+            merged.merge(QuantileSketch().update(part))
+
+        whole = QuantileSketch().update(values)
+
+        assert merged.count == whole.count == len(values)
+        pd.testing.assert_series_equal(
+            merged.quantile(percentiles.top_ten), whole.quantile(percentiles.top_ten)
+        )
+
+    def test_from_chunks_reads_a_column(self, tmp_path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.chdir(tmp_path)
+        pd.DataFrame({"amount": [1.0, None, 3.0, 4.0]}).to_csv("a.csv", index=False)
+        pd.DataFrame({"amount": [5, 6]}).to_csv("b.csv", index=False)
+
+        sketch = QuantileSketch.from_chunks(iter_csvs("*.csv", batch_rows=2), column="amount")
+
+        assert sketch.count == 5
+        assert sketch.quantile(0) == 1.0
+        assert sketch.quantile(1) == pytest.approx(6.0, rel=0.01)
+
+    def test_empty_sketch_answers_nan(self):
+        assert np.isnan(QuantileSketch().update([np.nan]).quantile(0.5))
+
+    def test_rejects_invalid_input(self):
+        with pytest.raises(ValueError, match="between 0 and 1"):
+            QuantileSketch().quantile(1.5)
+        with pytest.raises(ValueError, match="infinite"):
+            QuantileSketch().update([1.0, np.inf])
+        with pytest.raises(ValueError, match="different `relative_accuracy`"):
+            QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+
 class TestTools:
 
     def test_dt_group_builds_a_grouper(self):
@@ -280,6 +989,48 @@ class TestTools:
         assert isinstance(grouper, pd.Grouper)
         assert grouper.key == "day"
 
+    @pytest.fixture
+    def events(self) -> pd.DataFrame:
+        rng = np.random.default_rng(0)
+        # Spans the spring DST switch in Europe/Berlin
+        timestamps = pd.Timestamp("2024-03-29 13:17") + pd.to_timedelta(
+            rng.integers(0, 4 * 86400, 5_000), unit="s"
+        )
+        return pd.DataFrame({
+            "time": timestamps,
+            "channel": rng.choice(["web", "app"], 5_000),
+            "amount": rng.integers(0, 100, 5_000),
+        })
+
+    @pytest.mark.parametrize("freq", ["15min", "h", "7h", "D", "2D"])
+    @pytest.mark.parametrize("tz", [None, "Europe/Berlin"])
+    def test_dt_aggregate_matches_grouper(self, events: pd.DataFrame, freq: str, tz: str | None):
+        if tz is not None:
+            events["time"] = events["time"].dt.tz_localize("UTC").dt.tz_convert(tz)
+        values = events.drop(columns="channel")
+
+        pd.testing.assert_frame_equal(
+            dt_aggregate(values, "time", freq),
+            values.groupby(dt_group("time", freq)).agg("sum"),
+        )
+        pd.testing.assert_frame_equal(
+            dt_aggregate(events, "time", freq, ["sum", "max"], by="channel"),
+            events.groupby([dt_group("time", freq), "channel"]).agg(["sum", "max"]),
+        )
+
+    def test_dt_aggregate_skips_missing_timestamps(self, events: pd.DataFrame):
+        events.loc[::7, "time"] = pd.NaT
+        values = events.drop(columns="channel")
+
+        pd.testing.assert_series_equal(
+            dt_aggregate(values, "time", "h", "mean")["amount"],
+            values.groupby(dt_group("time", "h"))["amount"].mean(),
+        )
+
+    def test_dt_aggregate_rejects_calendar_frequencies(self, events: pd.DataFrame):
+        with pytest.raises(ValueError, match="fixed frequency"):
+            dt_aggregate(events, "time", "ME")
+
     @pytest.mark.parametrize(
         ("insert_index", "expected"),
         [
@@ -299,6 +1050,60 @@ class TestTools:
 
         assert result.columns.tolist() == expected
 
+    @pytest.mark.parametrize("copy_on_write", [True, False])
+    @pytest.mark.parametrize("how", ["inner", "left", "right", "outer"])
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            {"on": "id"},
+            {"left_on": "id", "right_on": "key"},
+            {"left_index": True, "right_index": True},
+        ],
+        ids=["on", "left_on", "index"],
+    )
+    def test_merge_insert_at_matches_merge(self,
+                                           copy_on_write: bool,
+                                           how: str,
+                                           kwargs: dict,
+                                           monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr("nsds.frame.tools.copy_on_write", lambda: copy_on_write)
+        df_l = pd.DataFrame({"id": [1, 2, 3, 3], "a": [1, 2, 3, 4]}, index=[5, 6, 7, 8])
+        df_r = pd.DataFrame({
+            "id": [3, 1, 9],
+            "new": [9, 8, 7],
+            "label": pd.array(["x", None, "z"], dtype="string"),
+        }, index=[3, 5, 9])
+        if "right_on" in kwargs:
+            df_r = df_r.rename(columns={"id": "key"})
+        if "right_index" in kwargs:
+            df_r = df_r.drop(columns="id")
+
+        result = merge_insert_at(df_l, df_r, 1, how=how, **kwargs)
+
+        expected = pd.merge(df_l, df_r, how=how, **kwargs)
+        added = [col for col in df_r.columns if col not in df_l.columns]
+        pd.testing.assert_frame_equal(result, expected[["id", *added, "a"]])
+
+    @pytest.mark.parametrize("copy_on_write", [True, False])
+    def test_merge_insert_at_on_an_index_level(self,
+                                               copy_on_write: bool,
+                                               monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr("nsds.frame.tools.copy_on_write", lambda: copy_on_write)
+        df_l = pd.DataFrame({"a": [1, 2], "b": [3, 4]}, index=pd.Index([1, 2], name="id"))
+        df_r = pd.DataFrame({"id": [2, 1], "new": [5, 6]})
+
+        result = merge_insert_at(df_l, df_r, 1, on="id")
+
+        assert result.columns.tolist() == ["a", "id", "new", "b"]
+        assert result["new"].tolist() == [6, 5]
+
+    def test_merge_insert_at_rejects_shared_columns(self):
+        df_l = pd.DataFrame({"id": [1, 2], "a": [1, 2]})
+        df_r = pd.DataFrame({"id": [1, 2], "a": [3, 4]})
+
+        with pytest.raises(ValueError, match=r"\['a'\] are in both frames"):
+            merge_insert_at(df_l, df_r, 1, on="id")
+
     def test_percentiles(self):
         assert percentiles.bottom_one[0] == 0.001
         assert percentiles.top_ten[0] == 0.9
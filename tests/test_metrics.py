@@ -1,7 +1,17 @@
 import numpy as np
+import pandas as pd
 import pytest
 
-from nsds.metrics import r2_adjusted, r2_score, smape
+from nsds.metrics import (
+    R2Accumulator,
+    SmapeAccumulator,
+    bootstrap_ci,
+    grouped_metrics,
+    r2_adjusted,
+    r2_score,
+    smape,
+)
+from nsds.utils.numeric import gini_inequality_coefficient
 
 
 class TestR2Score:
@@ -28,6 +38,61 @@ class TestR2Score:
         assert r2_score(np.array([1, 2, 3]), np.array([1, 2, 3])) == pytest.approx(1.0)
 
 
+class TestR2ScoreMultiOutput:
+
+    @pytest.fixture
+    def data(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        rng = np.random.default_rng(0)
+        y_true = rng.normal(0, [1, 2, 3, 0], (1_000, 4)) + 2
+        y_pred = y_true + rng.normal(0, 1, (1_000, 4))
+        y_pred[:, 3] = 2
+        return y_true, y_pred, rng.random(1_000)
+
+    def test_raw_values_score_each_column(self, data):
+        y_true, y_pred, weight = data
+
+        result = r2_score(y_true, y_pred, sample_weight=weight, multioutput="raw_values")
+
+        expected = [
+            r2_score(y_true[:, i], y_pred[:, i], sample_weight=weight) for i in range(4)
+        ]
+        np.testing.assert_allclose(result, expected, rtol=1e-12)
+        assert result[3] == 1.0
+
+    def test_averages(self, data):
+        y_true, y_pred, weight = data
+        scores = r2_score(y_true, y_pred, sample_weight=weight, multioutput="raw_values")
+        deviations = y_true - np.average(y_true, axis=0, weights=weight)
+        variances = np.average(deviations ** 2, axis=0, weights=weight)
+
+        def score(multioutput) -> float:
+            return r2_score(y_true, y_pred, sample_weight=weight, multioutput=multioutput)
+
+        assert score("uniform_average") == pytest.approx(scores.mean())
+        assert score("variance_weighted") == pytest.approx(np.average(scores, weights=variances))
+        assert score([0, 1, 3, 0]) == pytest.approx((scores[1] + 3 * scores[2]) / 4)
+
+    def test_variance_weighted_without_variance_is_uniform(self):
+        result = r2_score([[1, 2], [1, 2]], [[1, 2], [1, 3]], multioutput="variance_weighted")
+        assert result == pytest.approx(0.5)
+
+    def test_float32_is_kept(self, data):
+        y_true, y_pred, _ = data
+
+        result = r2_score(
+            y_true.astype(np.float32), y_pred.astype(np.float32),
+            multioutput="raw_values", dtype=np.float32,
+        )
+
+        assert result.dtype == np.float32
+        expected = r2_score(y_true, y_pred, multioutput="raw_values")
+        np.testing.assert_allclose(result, expected, rtol=1e-5)
+
+    def test_rejects_unknown_multioutput(self):
+        with pytest.raises(ValueError, match="`multioutput` must be one of"):
+            r2_score([[1, 2]], [[1, 2]], multioutput="mean")
+
+
 class TestR2Adjusted:
 
     def test_penalises_features(self):
@@ -56,3 +121,168 @@ class TestSmape:
 
     def test_sample_weight_is_applied(self):
         assert smape([1, 1], [3, 1], sample_weight=[3, 1]) == pytest.approx(0.75)
+
+
+class TestGroupedMetrics:
+
+    def test_matches_the_scalar_functions_per_group(self):
+        rng = np.random.default_rng(0)
+        groups = pd.DataFrame({
+            "country": rng.choice(["de", "fr"], 1_000),
+            "week": rng.integers(0, 5, 1_000),
+        })
+        y_true = rng.random(1_000) * 10
+        y_pred = y_true + rng.normal(0, 1, 1_000)
+        weight = rng.random(1_000)
+
+        result = grouped_metrics(y_true, y_pred, groups, n_features=2, sample_weight=weight)
+
+        assert result.columns.tolist() == [
+            "country", "week", "n", "r2", "r2_adjusted", "smape",
+        ]
+        for row, (key, rows) in zip(
+            result.itertuples(), groups.groupby(["country", "week"]).indices.items(), strict=True
+        ):
+            args = y_true[rows], y_pred[rows]
+            assert (row.country, row.week, row.n) == (*key, len(rows))
+            assert row.r2 == pytest.approx(r2_score(*args, sample_weight=weight[rows]))
+            assert row.r2_adjusted == pytest.approx(
+                r2_adjusted(*args, 2, sample_weight=weight[rows])
+            )
+            assert row.smape == pytest.approx(smape(*args, sample_weight=weight[rows]))
+
+    def test_constant_groups_follow_r2_score(self):
+        result = grouped_metrics([2, 2, 2, 2], [2, 2, 1, 3], ["a", "a", "b", "b"])
+
+        assert result["r2"].tolist() == [1.0, 0.0]
+        assert "r2_adjusted" not in result
+
+    def test_rows_without_a_key_are_skipped(self):
+        result = grouped_metrics([1, 2, 3], [1, 2, 0], pd.Series(["a", "a", None], name="seg"))
+
+        assert result["seg"].tolist() == ["a"]
+        assert result["n"].tolist() == [2]
+        assert result["smape"].tolist() == [0.0]
+
+
+class TestAccumulators:
+
+    @pytest.fixture
+    def data(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        rng = np.random.default_rng(0)
+        # A large offset, where a naive sum of squares loses most digits
+        y_true = rng.normal(1e6, 3, 10_000)
+        return y_true, y_true + rng.normal(0, 1, 10_000), rng.random(10_000)
+
+    @pytest.mark.parametrize(
+        ("accumulator", "metric"),
+        [(R2Accumulator, r2_score), (SmapeAccumulator, smape)],
+        ids=["r2", "smape"],
+    )
+    def test_chunks_and_merges_match_the_batch_metric(self, data, accumulator, metric):
+        y_true, y_pred, weight = data
+        left, right = accumulator(), accumulator()
+        for start in range(0, len(y_true), 1_500):
+            chunk = slice(start, start + 1_500)
+            (left if start % 3_000 else right).update(y_true[chunk], y_pred[chunk], weight[chunk])
+
+        result = left.merge(right).result()
+
+        assert result == pytest.approx(metric(y_true, y_pred, sample_weight=weight), rel=1e-12)
+
+    @pytest.mark.parametrize(
+        ("y_pred", "expected"),
+        [([0.1, 0.1, 0.1], 1.0), ([0.1, 0.1, 0.2], 0.0)],
+        ids=["perfect", "imperfect"],
+    )
+    def test_r2_of_a_constant_y_true(self, y_pred: list, expected: float):
+        accumulator = R2Accumulator().update([0.1, 0.1], y_pred[:2]).update([0.1], y_pred[2:])
+        assert accumulator.result() == expected
+        assert r2_score([0.1, 0.1, 0.1], y_pred) == expected
+
+    def test_constant_y_true_agrees_everywhere(self):
+        # Constants whose mean rounds away from the value itself
+        rng = np.random.default_rng(0)
+        groups = np.repeat(np.arange(200), rng.integers(2, 20, 200))
+        y_true = rng.random(200).round(3)[groups]
+        y_pred = y_true + rng.choice([0, 0.01], len(groups))
+
+        grouped = grouped_metrics(y_true, y_pred, groups)["r2"].tolist()
+
+        for group, expected in enumerate(grouped):
+            rows = groups == group
+            accumulator = R2Accumulator()
+            for row in np.flatnonzero(rows):
+                accumulator.update(y_true[row:row + 1], y_pred[row:row + 1])
+            assert r2_score(y_true[rows], y_pred[rows]) == expected
+            assert accumulator.result() == expected
+            estimate = bootstrap_ci(r2_score, y_true[rows], y_pred[rows], n_resamples=1)
+            assert estimate["estimate"] == expected
+
+    @pytest.mark.parametrize("accumulator", [R2Accumulator, SmapeAccumulator])
+    def test_rejects_2d_inputs(self, accumulator):
+        y_true = np.arange(12.0).reshape(6, 2)
+
+        with pytest.raises(ValueError, match="Only 1-D"):
+            accumulator().update(y_true, y_true + 1)
+
+    def test_empty_accumulators_are_nan(self):
+        assert np.isnan(R2Accumulator().result())
+        assert np.isnan(SmapeAccumulator().merge(SmapeAccumulator()).result())
+
+
+class TestBootstrapCi:
+
+    @pytest.fixture
+    def data(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        rng = np.random.default_rng(0)
+        y_true = rng.lognormal(size=300)
+        return y_true, y_true + rng.normal(0, 0.5, 300), rng.random(300)
+
+    @pytest.mark.parametrize(
+        ("metric", "n_arrays"),
+        [(r2_score, 2), (smape, 2), (gini_inequality_coefficient, 1)],
+        ids=["r2", "smape", "gini"],
+    )
+    def test_interval_matches_a_resampling_loop(self, data, metric, n_arrays: int):
+        arrays, weight = data[:n_arrays], data[2]
+
+        def score(rows: np.ndarray) -> float:
+            resampled = [array[rows] for array in arrays]
+            if metric is gini_inequality_coefficient:
+                return metric(*resampled, weight[rows])
+            return metric(*resampled, sample_weight=weight[rows])
+
+        rng = np.random.default_rng(1)
+        scores = [score(rng.integers(0, len(weight), len(weight))) for _ in range(2_000)]
+
+        result = bootstrap_ci(metric, *arrays, sample_weight=weight, n_resamples=2_000)
+
+        expected = score(np.arange(len(weight)))
+        assert result["estimate"] == pytest.approx(expected)
+        assert result["low"] < result["estimate"] < result["high"]
+        low, high = np.quantile(scores, [0.025, 0.975])
+        assert result["low"] == pytest.approx(low, abs=(high - low) / 10)
+        assert result["high"] == pytest.approx(high, abs=(high - low) / 10)
+
+    def test_is_reproducible_with_a_pool(self, data):
+        y_true, y_pred, _ = data
+        kwargs = {"n_resamples": 100, "max_memory_mb": 0.1}
+
+        result = bootstrap_ci(smape, y_true, y_pred, n_jobs=2, executor="thread", **kwargs)
+
+        pd.testing.assert_series_equal(result, bootstrap_ci(smape, y_true, y_pred, **kwargs))
+
+    def test_constant_r2(self):
+        result = bootstrap_ci(r2_score, [0.1, 0.1, 0.1], [0.1, 0.1, 0.1], n_resamples=10)
+        assert result.tolist() == [1.0, 1.0, 1.0]
+
+    def test_rejects_2d_inputs(self):
+        y_true = np.arange(12.0).reshape(6, 2)
+
+        with pytest.raises(ValueError, match="Only 1-D"):
+            bootstrap_ci(r2_score, y_true, y_true + 1)
+
+    def test_rejects_other_metrics(self):
+        with pytest.raises(ValueError, match="`metric` must be one of"):
+            bootstrap_ci(r2_adjusted, [1, 2], [1, 2])
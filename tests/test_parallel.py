@@ -0,0 +1,23 @@
+import pytest
+
+from nsds._parallel import ordered_map
+
+
+def _square(x: int) -> int:
+    return x * x
+
+
+def test_single_worker_is_a_plain_map():
+    assert isinstance(ordered_map(_square, [1, 2]), map)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_pool_keeps_the_input_order(executor: str):
+    result = ordered_map(_square, range(20), max_workers=4, executor=executor, chunksize=3)
+
+    assert list(result) == [x * x for x in range(20)]
+
+
+def test_rejects_unknown_executors():
+    with pytest.raises(ValueError, match="`executor` must be one of"):
+        ordered_map(_square, [1], executor="gpu")